@@ -1,11 +1,14 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional
 
 from textual.content import Content
 from textual.message import Message
 from textual.message_pump import MessagePump
 
+if TYPE_CHECKING:
+    from le_chat.utils.prompt.token_count import PromptTokenCounter
+
 class AgentReady(Message):
     """Agent is ready."""
 
@@ -64,6 +67,10 @@ class AgentBase(ABC):
     
     def get_info(self) -> Content:
         return Content("")
+
+    def token_counter(self) -> "PromptTokenCounter | None":
+        """Counter for the live token estimate of the prompt, if the agent can tokenize locally."""
+        return None
     
     async def stop(self) -> None:
         "Stop the agent(gracefully exit the process)"
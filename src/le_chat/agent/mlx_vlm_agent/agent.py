@@ -1,4 +1,5 @@
 import asyncio
+import copy
 import threading
 from dataclasses import dataclass
 from typing import List, Optional
@@ -9,12 +10,20 @@ from mlx_vlm.generate import stream_generate as vlm_stream_generate
 
 from mlx_lm import load as lm_load
 from mlx_lm.generate import stream_generate as lm_stream_generate
+from mlx_lm.models.cache import make_prompt_cache as lm_make_prompt_cache
 
 from textual.message_pump import MessagePump
 from le_chat.agent.agent import AgentBase, AgentFail, AgentReady, AgentLoading, MessageContainer, MessageDetails
 from le_chat.agent.huggingface_utils import download_model
 from le_chat.widgets.response import ResponseUpdate, ResponseMetadataUpdate
+from le_chat.agent.mlx_vlm_agent.prefill import PromptPrefill
 from le_chat.agent.mlx_vlm_agent.prompt import build as build_prompt
+from le_chat.utils.audio_io import SAMPLE_RATE, normalized_wav_path
+from le_chat.utils.image_io import PIXELS_PER_TOKEN
+from le_chat.utils.prompt.token_count import PromptTokenCounter
+
+DEFAULT_IMAGE_MAX_SIDE = 1536
+"""For processors that do not state a native resolution."""
 
 
 @dataclass
@@ -25,6 +34,7 @@ class MLXVLMMessageDetails(MessageDetails):
     prompt_tps: float = 0.0
     generation_tps: float = 0.0
     peak_memory: float = 0.0
+    attachment_tokens_saved: int = 0
 
 @dataclass
 class MLXVLMMessageContainer(MessageContainer):
@@ -48,10 +58,27 @@ class MLXVLMAgent(AgentBase):
         self.agent = None
         self.processor = None
         self.max_tokens = 2048
+        # Token budgets for text attachments, per file and per prompt.
+        self.attachment_budget = 4096
+        self.prompt_attachment_budget = 16384
+        # Images are downscaled to the model's native resolution, or to this
+        # many vision tokens if set.
+        self.image_token_budget: int | None = None
         self.history: List[MLXVLMMessageContainer] = []
         self._cancel_event: threading.Event = threading.Event()
         self._is_generating: bool = False
         self._is_vlm: bool = True  # Default to VLM, will be set during loading
+        # KV cache filled early by `prefill`; guarded by the lock.
+        self._prefill: PromptPrefill | None = None
+        self._prefill_lock = threading.Lock()
+        # The text last prefilled; only the turn it was written for generates
+        # from the prefilled cache.
+        self._prefilled: str | None = None
+        self._cached_prompt_tokens = 0
+        # Counting runs on other threads than generation, and a fast tokenizer
+        # cannot be used from two threads at once, so it gets its own copy.
+        self._counting_tokenizer = None
+        self._counting_lock = threading.Lock()
     
     def _update_loading_status(self, status: str) -> None:
         self.post_message(AgentLoading(status))
@@ -83,6 +110,8 @@ class MLXVLMAgent(AgentBase):
             self.agent = model
             self.processor = processor
             self._is_vlm = is_vlm
+            self._prefill = None
+            self._counting_tokenizer = None
             self.post_message(AgentReady())
         except Exception:
             self._update_loading_status(f"Downloading {self.model_name}...")
@@ -93,6 +122,8 @@ class MLXVLMAgent(AgentBase):
                     self.agent = model
                     self.processor = processor
                     self._is_vlm = is_vlm
+                    self._prefill = None
+                    self._counting_tokenizer = None
                     self.post_message(AgentReady())
                 else:
                     self.post_message(AgentFail("Download failed", f"Failed to download {self.model_name}"))
@@ -116,11 +147,11 @@ class MLXVLMAgent(AgentBase):
         # Event already set (cancellation already requested)
         return False
     
-    def _prepare_messages(self) -> str:
+    def _prepare_messages(self, history: List[MLXVLMMessageContainer] | None = None) -> str:
         messages = []
         images = []
         audio = []
-        for mess in self.history:
+        for mess in self.history if history is None else history:
             messages.append({
                 "role": mess.role,
                 "content": mess.content,
@@ -143,12 +174,79 @@ class MLXVLMAgent(AgentBase):
         print(formatted_prompt)
         return formatted_prompt, images, audio
         
-    def _stream_generate(self, prompt, images, audio):
+    def _normalized_audio(self, audio: List[str]) -> List[str]:
+        """Point mlx_vlm at cached WAVs already at the feature extractor's rate.
+
+        mlx_vlm only accepts audio paths and decodes them on every turn, so the
+        history's audio is decoded and resampled once here instead.
+        """
+        feature_extractor = getattr(self.processor, "feature_extractor", None)
+        sr = getattr(feature_extractor, "sampling_rate", None) or SAMPLE_RATE
+        return [str(normalized_wav_path(path, sr)) for path in audio]
+
+    def _prefill_state(self) -> PromptPrefill:
+        if self._prefill is None:
+            self._prefill = PromptPrefill(self.agent, lambda: lm_make_prompt_cache(self.agent))
+        return self._prefill
+
+    def _encode(self, prompt: str) -> List[int]:
+        """Tokenize a formatted prompt the way mlx_lm's stream_generate would."""
+        add_special_tokens = self.processor.bos_token is None or not prompt.startswith(self.processor.bos_token)
+        return self.processor.encode(prompt, add_special_tokens=add_special_tokens)
+
+    def prefill(self, text: str) -> int:
+        """Prefill the KV cache with a user turn that is still being written or spoken.
+
+        Blocking; call it from a worker thread. Only text models loaded with
+        mlx_lm are prefilled: an mlx_vlm model builds its cache from inputs
+        (embeddings, positions) that its `language_model` alone does not see.
+        Skipped while a reply is being generated.
+
+        Returns:
+            Number of prompt tokens evaluated.
+        """
+        if self.agent is None or self._is_vlm or self._is_generating:
+            return 0
+        history = self.history + [MLXVLMMessageContainer(role="user", content=text)]
+        prompt, images, audio = self._prepare_messages(history)
+        with self._prefill_lock:
+            if self._is_generating:
+                return 0
+            tokens = self._prefill_state().prefill(self._encode(prompt))
+            self._prefilled = text
+            return tokens
+
+    def _stream_cached(self, prompt):
+        """Generation that reuses (and extends) the KV cache prefilled for this turn."""
+        with self._prefill_lock:
+            state = self._prefill_state()
+            tokens = self._encode(prompt)
+            pending = state.prepare(tokens)
+            # stream_generate only counts the tokens it evaluated.
+            self._cached_prompt_tokens = len(tokens) - len(pending)
+            generated = []
+            try:
+                responses = lm_stream_generate(
+                    self.agent,
+                    self.processor,
+                    pending,
+                    max_tokens=self.max_tokens,
+                    prompt_cache=state.cache,
+                )
+                for response in responses:
+                    generated.append(int(response.token))
+                    yield response
+            finally:
+                state.record(generated)
+
+    def _stream_generate(self, prompt, images, audio, prefilled: bool = False):
         """
         Generator that yields responses from the appropriate stream_generate function
         based on whether the model is VLM or LM.
         """
-        if self._is_vlm:
+        if prefilled and not self._is_vlm:
+            yield from self._stream_cached(prompt)
+        elif self._is_vlm:
             # VLM: Use mlx_vlm's stream_generate with image/audio support
             yield from vlm_stream_generate(
                 self.agent, 
@@ -156,7 +254,7 @@ class MLXVLMAgent(AgentBase):
                 prompt, 
                 image=images if len(images) else None, 
                 # Currently supports one audio file
-                audio=audio[-1:] if len(audio) else None,
+                audio=self._normalized_audio(audio[-1:]) if len(audio) else None,
                 max_tokens=self.max_tokens,
                 skip_special_tokens=False,
             )
@@ -169,8 +267,52 @@ class MLXVLMAgent(AgentBase):
                 max_tokens=self.max_tokens,
             )
 
+    def _count_tokens(self, text: str) -> int:
+        with self._counting_lock:
+            if self._counting_tokenizer is None:
+                tokenizer = self.processor.tokenizer if hasattr(self.processor, "tokenizer") else self.processor
+                self._counting_tokenizer = copy.deepcopy(tokenizer)
+            return len(self._counting_tokenizer.encode(text, add_special_tokens=False))
+
+    def _image_limits(self) -> tuple[int | None, int | None]:
+        """(max side, max pixels) for attached images."""
+        if self.image_token_budget is not None:
+            return None, self.image_token_budget * PIXELS_PER_TOKEN
+        image_processor = getattr(self.processor, "image_processor", None)
+        if (max_pixels := getattr(image_processor, "max_pixels", None)) is not None:
+            return None, max_pixels
+        size = getattr(image_processor, "size", None)
+        if isinstance(size, int):
+            return size, None
+        if isinstance(size, dict):
+            sides = [v for k, v in size.items() if k in ("height", "width", "longest_edge") and isinstance(v, int)]
+            if sides:
+                return max(sides), None
+        return DEFAULT_IMAGE_MAX_SIDE, None
+
+    def token_counter(self) -> PromptTokenCounter | None:
+        if self.processor is None:
+            return None
+        image_max_side, image_max_pixels = self._image_limits() if self._is_vlm else (None, None)
+        return PromptTokenCounter(
+            self._count_tokens,
+            lambda: [message.content for message in list(self.history)],
+            attachment_budget=self.attachment_budget,
+            prompt_budget=self.prompt_attachment_budget,
+            image_max_side=image_max_side,
+            image_max_pixels=image_max_pixels,
+        )
+
     async def send_prompt(self, prompt: str) -> str | None:
-        mlxvlm_prompt = build_prompt(prompt)
+        image_max_side, image_max_pixels = self._image_limits() if self._is_vlm else (None, None)
+        mlxvlm_prompt = build_prompt(
+            prompt,
+            count_tokens=self._count_tokens if self.processor is not None else None,
+            attachment_budget=self.attachment_budget,
+            prompt_budget=self.prompt_attachment_budget,
+            image_max_side=image_max_side,
+            image_max_pixels=image_max_pixels,
+        )
         user_input = MLXVLMMessageContainer(
             role="user",
             content=mlxvlm_prompt.prompt,
@@ -186,6 +328,9 @@ class MLXVLMAgent(AgentBase):
         text = ""
         self._cancel_event.clear()
         self._is_generating = True
+        prefilled = self._prefilled is not None and prompt.startswith(self._prefilled)
+        self._prefilled = None
+        self._cached_prompt_tokens = 0
         try:
             prompt, images, audio = self._prepare_messages()
             print(audio)
@@ -193,7 +338,7 @@ class MLXVLMAgent(AgentBase):
             
             # This method is already running in a thread (via @work(thread=True)),
             # so we can do blocking work directly here and check cancellation between iterations
-            for response in self._stream_generate(prompt, images, audio):
+            for response in self._stream_generate(prompt, images, audio, prefilled):
                 # Check for cancellation between iterations
                 if self._cancel_event.is_set():
                     self.post_message(ResponseUpdate(text="\n\n[Generation cancelled by user]"))
@@ -214,7 +359,11 @@ class MLXVLMAgent(AgentBase):
                     prompt_tps=getattr(last_response, "prompt_tps", None),
                     generation_tps=getattr(last_response, "generation_tps", None),
                     peak_memory=getattr(last_response, "peak_memory", None),
+                    attachment_tokens_saved=mlxvlm_prompt.tokens_saved,
                 )
+                for key in ("prompt_tokens", "total_tokens"):
+                    if metadata[key] is not None:
+                        metadata[key] += self._cached_prompt_tokens
                 
                 details = MLXVLMMessageDetails(**metadata)
                 message = ResponseMetadataUpdate(**metadata)
@@ -0,0 +1,85 @@
+"""Reusable KV cache that can be filled ahead of generation."""
+from typing import Any, Callable, List
+
+import mlx.core as mx
+from mlx_lm.models.cache import cache_length, can_trim_prompt_cache, trim_prompt_cache
+
+
+def common_prefix(a: List[int], b: List[int]) -> int:
+    """Length of the longest common prefix of two token lists."""
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PromptPrefill:
+    """Keeps a prompt cache in step with the tokens that produced it.
+
+    While the user is still speaking, `prefill` runs the model over the
+    prompt built from the text committed so far. When the final prompt is
+    sent, `prepare` trims the cache back to the longest prefix it shares
+    with the final tokens, so generation only has to process the tail.
+
+    Args:
+        model: Callable as `model(tokens[None], cache=cache)`, i.e. an mlx_lm model.
+        make_cache: Builds an empty cache for `model`.
+        step: Tokens evaluated per forward pass while prefilling.
+    """
+
+    def __init__(self, model: Callable, make_cache: Callable[[], List[Any]], step: int = 512) -> None:
+        self.model = model
+        self.make_cache = make_cache
+        self.step = step
+        self.cache: List[Any] = make_cache()
+        self.tokens: List[int] = []
+
+    def reset(self) -> None:
+        self.cache = self.make_cache()
+        self.tokens = []
+
+    def _sync(self, tokens: List[int]) -> List[int]:
+        """Trim the cache to what it shares with `tokens`; return the tokens it still lacks."""
+        keep = common_prefix(self.tokens, tokens)
+        if keep < len(self.tokens):
+            if can_trim_prompt_cache(self.cache):
+                trim_prompt_cache(self.cache, len(self.tokens) - keep)
+                self.tokens = self.tokens[:keep]
+            else:
+                self.reset()
+        return tokens[len(self.tokens):]
+
+    def prefill(self, tokens: List[int]) -> int:
+        """Run the model over `tokens` except the last, reusing what is cached.
+
+        Returns:
+            Number of tokens evaluated.
+        """
+        pending = self._sync(tokens[:-1])
+        for start in range(0, len(pending), self.step):
+            chunk = pending[start:start + self.step]
+            self.model(mx.array(chunk)[None], cache=self.cache)
+            mx.eval([c.state for c in self.cache])
+            self.tokens += chunk
+        return len(pending)
+
+    def prepare(self, tokens: List[int]) -> List[int]:
+        """Get the cache ready to generate from `tokens`; returns the uncached tail (never empty)."""
+        if len(tokens) and common_prefix(self.tokens, tokens) >= len(tokens):
+            # Generation needs at least one new token to produce logits from.
+            self._sync(tokens[:-1])
+        pending = self._sync(tokens)
+        self.tokens = list(tokens)
+        return pending
+
+    def record(self, generated: List[int]) -> None:
+        """Account for tokens the model appended to the cache while generating."""
+        try:
+            length = cache_length(self.cache)
+        except TypeError:
+            # Cache types without a length (e.g. recurrent state) cannot be resynced.
+            self.reset()
+            return
+        self.tokens = (self.tokens + generated)[:length]
@@ -1,7 +1,10 @@
 from pathlib import Path
 from dataclasses import dataclass
-from typing import TYPE_CHECKING, List, Literal, Optional
-from le_chat.utils.prompt.extract import extract_paths_from_prompt
+from typing import TYPE_CHECKING, Callable, List, Literal, Optional
+from le_chat.utils.image_io import normalized_image_path
+from le_chat.utils.prompt.budget import fit_text
+from le_chat.utils.prompt.extract import expand_glob, extract_paths_from_prompt, is_glob
+from le_chat.utils.prompt.index import directory_indexes
 from le_chat.utils.prompt.resource import load_resource
 
 
@@ -10,24 +13,71 @@ class MLXVLMInput:
     prompt: str
     images: Optional[List[str]]
     audio: Optional[List[str]]
+    tokens_saved: int = 0
+    """Attachment tokens left out to stay within the budget."""
 
-def build(prompt: str):
+def build(
+    prompt: str,
+    count_tokens: Callable[[str], int] | None = None,
+    attachment_budget: int = 4096,
+    prompt_budget: int = 16384,
+    directory_top_k: int = 8,
+    image_max_side: int | None = None,
+    image_max_pixels: int | None = None,
+):
+    """Replace @file references with their contents.
+
+    Args:
+        prompt: The user prompt potentially containing @file references.
+        count_tokens: The model's token counter. When given, text attachments
+            are cut down to `attachment_budget` tokens each and
+            `prompt_budget` in total (see `fit_text`); otherwise they are
+            pasted whole.
+        directory_top_k: Chunks retrieved for each @directory reference.
+        image_max_side: Downscale images so their longest side fits, e.g. the
+            model's native resolution.
+        image_max_pixels: Downscale images to at most this many pixels.
+            With either limit set, images are handed to the model as cached
+            resized copies (see `normalized_image_path`).
+
+    Glob references (`@src/**/*.py`) expand to every matching text file,
+    within the caps of `expand_glob`.
+    """
     result = []
     last_index = 0
     audio = []
     images = []
+    tokens_saved = 0
+    remaining = prompt_budget
+    query = "".join(prompt[i:j] for i, j in _outside_paths(prompt))
     for path, a, b in extract_paths_from_prompt(prompt):
         additional_token = ""
-        resource = load_resource(Path(path))
-        if resource.resource_type == 'text':
-            additional_token = f"\nFile Path: {str(resource.path)}\n Content:\n {resource.text}\n"
-        elif resource.resource_type == 'audio':
-            additional_token = ""
-            audio.append(str(resource.path))
-
-        elif resource.resource_type == "image":
-            additional_token = f"\nImage here: {str(resource.path)}\n"
-            images.append(str(resource.path))
+        if is_glob(path):
+            resources = expand_glob(path).resources
+        elif Path(path).is_dir():
+            hits = directory_indexes.search(Path(path), query, k=directory_top_k)
+            additional_token = "".join(
+                f"\nFile Path: {hit.path} (lines {hit.start_line + 1}-{hit.end_line})\n Content:\n {hit.text}\n"
+                for hit in hits
+            ) or f"\nDirectory: {path} (nothing relevant found)\n"
+            resources = []
+        else:
+            resources = [load_resource(Path(path))]
+        for resource in resources:
+            if resource.resource_type == 'text':
+                content = resource.text
+                if count_tokens is not None:
+                    fitted = fit_text(content, max(0, min(attachment_budget, remaining)), count_tokens, query=query)
+                    content = fitted.text
+                    remaining -= fitted.tokens
+                    tokens_saved += fitted.tokens_saved
+                additional_token += f"\nFile Path: {str(resource.path)}\n Content:\n {content}\n"
+            elif resource.resource_type == 'audio':
+                audio.append(str(resource.path))
+
+            elif resource.resource_type == "image":
+                additional_token += f"\nImage here: {str(resource.path)}\n"
+                images.append(_model_image(resource.path, image_max_side, image_max_pixels))
             
         result.append(prompt[last_index:a])
         result.append(additional_token)
@@ -38,10 +88,33 @@ def build(prompt: str):
     return MLXVLMInput(
         prompt=replaced_prompt,
         images=images,
-        audio=audio
+        audio=audio,
+        tokens_saved=tokens_saved,
     )
 
 
+def _model_image(path: Path, max_side: int | None, max_pixels: int | None) -> str:
+    """Path of the image to give the model: a resized cached copy when limits are set."""
+    if max_side is None and max_pixels is None:
+        return str(path)
+    try:
+        return str(normalized_image_path(path, max_side=max_side, max_pixels=max_pixels))
+    except Exception:
+        # Leave formats PIL cannot decode to the model's own loader.
+        import traceback
+        print(traceback.format_exc())
+        return str(path)
+
+
+def _outside_paths(prompt: str):
+    """Spans of the prompt that are not @file references."""
+    start = 0
+    for _, a, b in extract_paths_from_prompt(prompt):
+        yield start, a
+        start = b
+    yield start, len(prompt)
+
+
 if __name__ == "__main__":
     prompt = """
     Explain what's in the file please? @/Users/deekshith/Downloads/save.txt"""
@@ -1,3 +1,4 @@
 from .model import MLXAudioSTTModel
+from .registry import STTModelRegistry, stt_models
 
-__all__ = ["MLXAudioSTTModel"]
\ No newline at end of file
+__all__ = ["MLXAudioSTTModel", "STTModelRegistry", "stt_models"]
\ No newline at end of file
@@ -1,7 +1,9 @@
 
 from abc import ABC
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterator, Optional
 
 from textual.message import Message
 from textual.message_pump import MessagePump
@@ -12,6 +14,28 @@ class STTModelReady(Message):
 class STTFullTranscriptionReady(Message):
     """Full transcription is ready."""
 
+@dataclass
+class STTChunkTranscribed(Message):
+    """A live recording chunk has been transcribed."""
+    audio_sec: float
+    elapsed_sec: float
+    """Decode time; feature extraction overlaps the previous chunk's decode."""
+    feature_sec: float = 0.0
+
+    @property
+    def rtf(self) -> float:
+        """Real-time factor: feature and decode time per second of audio."""
+        return (self.feature_sec + self.elapsed_sec) / self.audio_sec if self.audio_sec > 0 else 0.0
+
+@dataclass
+class STTBatchProgress(Message):
+    """One file of a batch transcription has finished."""
+    done: int
+    total: int
+    path: str
+    elapsed_sec: float
+    failed: bool = False
+
 @dataclass
 class STTModelLoading(Message):
     """Agent is being loaded."""
@@ -24,14 +48,39 @@ class STTModelFail(Message):
     details: str = ""
 
 
+_run_target: ContextVar[MessagePump | None] = ContextVar("stt_run_target", default=None)
+"""Receiver of the messages of the transcription run in the current context, if routed."""
+
+
 class STTModelBase(ABC):
     def __init__(self, model_name: str) -> None:
         self.model_name = model_name
         self._message_target : MessagePump | None = None
         super().__init__()
     
+    def attach(self, message_target: MessagePump | None) -> None:
+        """Send future messages to `message_target` (e.g. a new screen reusing this model)."""
+        self._message_target = message_target
+
+    @contextmanager
+    def routed_to(self, message_target: MessagePump | None) -> Iterator[None]:
+        """Send the messages of the run inside this block to `message_target`.
+
+        A shared model is used by several screens at once; routing each run
+        keeps one screen's transcript from reaching another that attached later.
+        Tasks started inside the block (e.g. pipeline stages) inherit the route.
+        """
+        if message_target is None:
+            yield
+            return
+        token = _run_target.set(message_target)
+        try:
+            yield
+        finally:
+            _run_target.reset(token)
+
     def post_message(self, message: MessagePump) -> bool:
-        if (message_target := self._message_target) is None:
+        if (message_target := _run_target.get() or self._message_target) is None:
             return False
         return message_target.post_message(message)
     
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""Real-time-factor benchmark for STT models.
+
+Runs every file of a local corpus through the live pipeline (`AudioProcessor`
+chunker feeding `MLXAudioSTTModel`) for each model and chunk size, replaying
+audio as fast as the model can take it, and prints the results as JSON:
+
+    python -m le_chat.agent.stt_model.benchmark --corpus ./corpus
+    python -m le_chat.agent.stt_model.benchmark --corpus ./corpus --profile cpu-small
+
+A corpus is a directory of audio files; `<name>.txt` next to `<name>.wav`
+(or .flac, .mp3, ...) holds the reference transcript used for word error rate.
+"""
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass, field
+import gc
+import json
+from pathlib import Path
+import re
+import resource
+import sys
+import time
+
+import mlx.core as mx
+
+AUDIO_SUFFIXES = {".wav", ".flac", ".mp3", ".ogg", ".m4a", ".aac", ".opus"}
+
+PROFILES = {
+    "default": {
+        "models": [
+            "mlx-community/parakeet-tdt-0.6b-v2",
+            "mlx-community/whisper-large-v3-turbo",
+            "mlx-community/Voxtral-Mini-3B-2507-bf16",
+        ],
+        "chunk_sec": [2.0, 5.0, 10.0],
+        "device": "gpu",
+    },
+    # Small enough to run on a CI machine without a GPU.
+    "cpu-small": {
+        "models": ["mlx-community/whisper-tiny"],
+        "chunk_sec": [5.0],
+        "device": "cpu",
+    },
+}
+
+
+@dataclass
+class FileResult:
+    path: str
+    audio_sec: float
+    wall_sec: float
+    rtf: float
+    first_text_sec: float | None
+    wer: float | None
+    hypothesis: str
+
+
+@dataclass
+class RunResult:
+    """One model at one chunk size over the whole corpus."""
+    model: str
+    chunk_sec: float
+    load_sec: float
+    audio_sec: float = 0.0
+    wall_sec: float = 0.0
+    rtf: float = 0.0
+    """Wall time over audio time for the whole pipeline."""
+    decode_rtf: float = 0.0
+    """Mean decode time over audio time per chunk."""
+    first_text_sec: float | None = None
+    """Mean time from the start of a file to its first transcribed text."""
+    peak_memory_mb: float = 0.0
+    wer: float | None = None
+    """Corpus word error rate over files that have a reference."""
+    errors: int = 0
+    files: list[FileResult] = field(default_factory=list)
+
+
+def _words(text: str) -> list[str]:
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference: str, hypothesis: str) -> tuple[int, int]:
+    """Word-level edit distance and reference length, ignoring case and punctuation."""
+    ref, hyp = _words(reference), _words(hypothesis)
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1], len(ref)
+
+
+def load_corpus(directory: Path) -> list[tuple[Path, str | None]]:
+    """Audio files of a corpus with their reference transcripts, in name order."""
+    corpus = []
+    for path in sorted(directory.iterdir()):
+        if path.suffix.lower() in AUDIO_SUFFIXES:
+            reference = path.with_suffix(".txt")
+            corpus.append((path, reference.read_text(encoding="utf-8") if reference.is_file() else None))
+    return corpus
+
+
+async def _run_file(model, samples, chunk_sec: float) -> tuple[float, float | None, list[str], int]:
+    from le_chat.agent.stt_model.live import CollectingTarget, run_live_transcription
+    from le_chat.audio import AudioProcessor
+    from le_chat.audio_sources import ArraySource
+
+    target = CollectingTarget()
+    model.attach(target)
+    processor = AudioProcessor(chunk_sec=chunk_sec, min_chunk_sec=min(2.0, chunk_sec), source=ArraySource(samples, speed=float("inf")))
+    started = time.perf_counter()
+    await run_live_transcription(model, processor)
+    wall = time.perf_counter() - started
+    first_text = target.first_text_at - started if target.first_text_at is not None else None
+    return wall, first_text, target.texts, len(target.errors)
+
+
+def benchmark_model(model_name: str, chunk_secs: list[float], corpus: list[tuple[Path, str | None]]) -> list[RunResult]:
+    """Load one model and run the corpus through it at every chunk size."""
+    from le_chat.agent.stt_model.live import CollectingTarget
+    from le_chat.agent.stt_model.model import MLXAudioSTTModel
+    from le_chat.utils.audio_io import SAMPLE_RATE, load_normalized
+
+    model = MLXAudioSTTModel(model_name)
+    started = time.perf_counter()
+    model.start(CollectingTarget())
+    load_sec = time.perf_counter() - started
+    if model.model is None:
+        raise RuntimeError(f"Failed to load {model_name}")
+
+    # Decode up front so file decoding is not part of the measurement.
+    audio = [(path, reference, load_normalized(path)) for path, reference in corpus]
+    results = []
+    for chunk_sec in chunk_secs:
+        run = RunResult(model=model_name, chunk_sec=chunk_sec, load_sec=load_sec)
+        mx.reset_peak_memory()
+        decode_sec = 0.0
+        first_texts = []
+        errors = ref_words = 0
+        for path, reference, samples in audio:
+            model.reset_stats()
+            wall, first_text, texts, failures = asyncio.run(_run_file(model, samples, chunk_sec))
+            stats = model.stats()
+            decode_sec += stats.decode_sec.mean * stats.decode_sec.count
+            hypothesis = " ".join(t.strip() for t in texts if t.strip())
+            audio_sec = samples.shape[0] / SAMPLE_RATE
+            wer = None
+            if reference is not None:
+                edits, n = word_errors(reference, hypothesis)
+                errors += edits
+                ref_words += n
+                wer = edits / n if n else None
+            if first_text is not None:
+                first_texts.append(first_text)
+            run.errors += failures
+            run.audio_sec += audio_sec
+            run.wall_sec += wall
+            run.files.append(FileResult(
+                path=str(path),
+                audio_sec=audio_sec,
+                wall_sec=wall,
+                rtf=wall / audio_sec if audio_sec else 0.0,
+                first_text_sec=first_text,
+                wer=wer,
+                hypothesis=hypothesis,
+            ))
+        if run.audio_sec:
+            run.rtf = run.wall_sec / run.audio_sec
+            run.decode_rtf = decode_sec / run.audio_sec
+        run.first_text_sec = sum(first_texts) / len(first_texts) if first_texts else None
+        run.wer = errors / ref_words if ref_words else None
+        run.peak_memory_mb = mx.get_peak_memory() / 1024**2
+        results.append(run)
+
+    model.model = None
+    gc.collect()
+    mx.clear_cache()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark STT models on a local audio corpus.")
+    parser.add_argument("--corpus", type=Path, required=True, help="Directory of audio files with <name>.txt references")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--models", nargs="+", help="Override the profile's models")
+    parser.add_argument("--chunk-sec", type=float, nargs="+", help="Override the profile's chunk sizes")
+    parser.add_argument("--output", type=Path, help="Write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    profile = PROFILES[args.profile]
+    if profile["device"] == "cpu":
+        # Must happen before the model module creates its streams.
+        mx.set_default_device(mx.cpu)
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        raise SystemExit(f"No audio files in {args.corpus}")
+
+    runs = []
+    for model_name in args.models or profile["models"]:
+        try:
+            runs += benchmark_model(model_name, args.chunk_sec or profile["chunk_sec"], corpus)
+        except Exception as e:
+            print(f"{model_name}: {e}", file=sys.stderr)
+
+    report = json.dumps({
+        "profile": args.profile,
+        "device": str(mx.default_device()),
+        "corpus": str(args.corpus),
+        "files": len(corpus),
+        # ru_maxrss is KiB on Linux and bytes on macOS.
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024**2 if sys.platform == "darwin" else 1024),
+        "runs": [asdict(run) for run in runs],
+    }, indent=2)
+    if args.output:
+        args.output.write_text(report, encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
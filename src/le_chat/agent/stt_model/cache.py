@@ -0,0 +1,75 @@
+"""Persistent transcript cache keyed by audio content, model and decode options."""
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+
+from le_chat.utils.cache import cache_dir, content_hash, evict_lru, touch
+
+
+@dataclass
+class CachedTranscript:
+    text: str
+    segments: list[dict] = field(default_factory=list)
+    """`{"start", "end", "text"}` dicts, in seconds."""
+    streamed: bool = False
+    """Whether segments are the windows of a streamed transcription."""
+
+
+class TranscriptCache:
+    """Stores transcripts as small JSON files, evicting least-recently-used ones past `max_bytes`."""
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = 64 * 1024 * 1024) -> None:
+        self.directory = directory or cache_dir("transcripts")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def key(self, audio_path: str | Path, model_name: str, options: dict | None = None) -> str:
+        digest = content_hash(Path(audio_path).resolve())
+        extra = json.dumps({"model": model_name, "options": options or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(f"{digest}\0{extra}".encode()).hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> CachedTranscript | None:
+        entry = self._entry(key)
+        try:
+            data = json.loads(entry.read_text(encoding="utf-8"))
+            transcript = CachedTranscript(**data)
+        except (OSError, ValueError, TypeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        touch(entry)
+        with self._lock:
+            self.hits += 1
+        return transcript
+
+    def put(self, key: str, transcript: CachedTranscript) -> None:
+        entry = self._entry(key)
+        tmp = entry.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            tmp.write_text(json.dumps(transcript.__dict__), encoding="utf-8")
+            os.replace(tmp, entry)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+            return
+        evict_lru(self.directory, self.max_bytes, pattern="*.json")
+
+
+def segments_of(result) -> list[dict]:
+    """Normalise model output (whisper segments, parakeet sentences) to plain dicts."""
+    segments = getattr(result, "segments", None)
+    if segments:
+        return [
+            {"start": float(s.get("start", 0.0)), "end": float(s.get("end", 0.0)), "text": s.get("text", "")}
+            for s in segments
+            if isinstance(s, dict)
+        ]
+    sentences = getattr(result, "sentences", None) or []
+    return [{"start": float(s.start), "end": float(s.end), "text": s.text} for s in sentences]
@@ -0,0 +1,103 @@
+"""Headless live transcription.
+
+Runs any `AudioSource` through the same `AudioProcessor` chunker and
+`MLXAudioSTTModel` queue that `SttScreen` uses, without Textual or a sound
+card, so the live pipeline can be profiled end to end on a CI machine:
+
+    python -m le_chat.agent.stt_model.live --source file:memo.wav --speed 8
+"""
+import argparse
+import asyncio
+from dataclasses import asdict
+import json
+import time
+
+from textual.message import Message
+
+from le_chat.agent.stt_model.base import STTModelFail
+from le_chat.agent.stt_model.model import MLXAudioSTTModel
+from le_chat.audio import AudioProcessor
+from le_chat.audio_sources import parse_source
+from le_chat.widgets.stt_response import STTResponseUpdate
+
+
+class CollectingTarget:
+    """Stands in for a screen: gathers the messages a model posts."""
+
+    def __init__(self, echo: bool = False) -> None:
+        self.echo = echo
+        self.texts: list[str] = []
+        self.errors: list[STTModelFail] = []
+        # `time.perf_counter()` when the first non-empty text arrived.
+        self.first_text_at: float | None = None
+
+    def post_message(self, message: Message) -> bool:
+        if isinstance(message, STTResponseUpdate):
+            self.texts.append(message.text)
+            if self.first_text_at is None and message.text.strip():
+                self.first_text_at = time.perf_counter()
+            if self.echo:
+                print(message.text, flush=True)
+        elif isinstance(message, STTModelFail):
+            self.errors.append(message)
+            if self.echo:
+                print(f"Error: {message.message} : {message.details}", flush=True)
+        return True
+
+
+async def run_live_transcription(model: MLXAudioSTTModel, processor: AudioProcessor) -> None:
+    """Record from `processor.source` until it ends (or is stopped) and transcribe it.
+
+    The model must already be started; its message target receives the text.
+    Recording and transcription run as two stages on the current event loop.
+    """
+    model.reset_stats()
+
+    async def produce() -> None:
+        async for chunk in processor.achunks():
+            await model.insert_samples(chunk.samples, captured_at=chunk.t1)
+        await model.finish()
+
+    processor.start()
+    try:
+        await asyncio.gather(model.transcribe(), produce())
+    finally:
+        processor.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the live STT pipeline headless.")
+    parser.add_argument("--source", default="tone:10", help="mic[:device], file:<path>, tone|noise|silence[:seconds]")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier for file/synthetic sources")
+    parser.add_argument("--model", default="mlx-community/parakeet-tdt-0.6b-v2")
+    parser.add_argument("--chunk-sec", type=float, default=5.0)
+    parser.add_argument("--quiet", action="store_true", help="Only print the final stats JSON")
+    args = parser.parse_args()
+
+    target = CollectingTarget(echo=not args.quiet)
+    model = MLXAudioSTTModel(args.model)
+    load_started = time.perf_counter()
+    model.start(target)
+    load_sec = time.perf_counter() - load_started
+    if model.model is None:
+        raise SystemExit(f"Failed to load {args.model}")
+
+    processor = AudioProcessor(chunk_sec=args.chunk_sec, source=parse_source(args.source, speed=args.speed))
+    started = time.perf_counter()
+    asyncio.run(run_live_transcription(model, processor))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "model": args.model,
+        "source": args.source,
+        "speed": args.speed,
+        "load_sec": load_sec,
+        "wall_sec": elapsed,
+        "capture": asdict(processor.stats()),
+        "transcription": asdict(model.stats()),
+        "errors": len(target.errors),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
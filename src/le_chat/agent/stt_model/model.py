@@ -1,30 +1,148 @@
 
+import asyncio
 import queue
 import threading
+import time
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from typing import Union
 from pathlib import Path
 
 import mlx.core as mx
+import numpy as np
 # Import huggingface_utils first to apply tqdm patches before other imports
 from le_chat.agent.huggingface_utils import download_model
 
 from textual.message_pump import MessagePump
-from le_chat.agent.stt_model.base import STTModelBase, STTModelFail, STTModelReady, STTModelLoading, STTFullTranscriptionReady
+from le_chat.agent.stt_model.cache import CachedTranscript, TranscriptCache, segments_of
+from le_chat.agent.stt_model.base import STTBatchProgress, STTChunkTranscribed, STTModelBase, STTModelFail, STTModelReady, STTModelLoading, STTFullTranscriptionReady
 from le_chat.agent.stt_model.utils import extract_audio_paths
 from mlx_audio.utils import load_model
 
+from le_chat.utils.audio_io import SAMPLE_RATE, audio_duration, decode_audio, iter_audio_windows, load_normalized
+from le_chat.utils.metrics import Gauge, GaugeSnapshot
 from le_chat.widgets.stt_response import STTResponseUpdate
 
+# Each stream is only ever used from one thread: `feature_stream` from a model's
+# "stt-features" executor and `generation_stream` from its "stt-live" executor.
+# MLX work on different streams from different threads is what lets features
+# for one chunk overlap decoding of the previous one; nothing else evaluates
+# MLX graphs concurrently.
 generation_stream = mx.new_stream(mx.default_device())
+feature_stream = mx.new_stream(mx.cpu)
+
+def _format_timestamp(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _wav_duration(path: str) -> float:
+    """Duration of a WAV file in seconds, read from its header."""
+    with wave.open(path, "rb") as wf:
+        return wf.getnframes() / float(wf.getframerate())
+
+
+@dataclass
+class QueuedAudio:
+    """A recorded chunk waiting for transcription, as a WAV path or 16 kHz samples."""
+    path: str | None
+    duration: float
+    captured_at: float | None = None
+    queued_at: float = field(default_factory=time.monotonic)
+    samples: np.ndarray | None = None
+
+
+@dataclass
+class STTModelStats:
+    """Point-in-time view of the transcription side of the pipeline."""
+    chunks_queued: int
+    chunks_transcribed: int
+    chunks_dropped: int
+    queue_depth: int
+    queue_capacity: int
+    queue_wait: GaugeSnapshot
+    transcription_lag: GaugeSnapshot
+    rtf: GaugeSnapshot
+    feature_sec: GaugeSnapshot
+    """Time spent extracting features per chunk (helper thread)."""
+    decode_sec: GaugeSnapshot
+    """Time spent decoding per chunk (model thread)."""
+    cache_hits: int
+    cache_misses: int
+
 
 class MLXAudioSTTModel(STTModelBase):
-    def __init__(self, model_name: str) -> None:
+    def __init__(
+        self,
+        model_name: str,
+        insert_timeout: float = 10.0,
+        stream_threshold_sec: float = 600.0,
+        stream_window_sec: float = 30.0,
+        cache: TranscriptCache | None = None,
+    ) -> None:
         super().__init__(model_name)
         self.model = None
         self._cancel_event: threading.Event = threading.Event()
         self._is_generating: bool = False
-        self._process_queue = queue.Queue(maxsize=10)
+        self._transcribing: bool = False
+        # Live chunks wait here; created on (and bound to) the loop that runs transcribe().
+        self.queue_size = 10
+        self._process_queue: asyncio.Queue[QueuedAudio | None] | None = None
+        self._queue_loop: asyncio.AbstractEventLoop | None = None
+        # Live model calls run on this one thread so the event loop stays responsive,
+        # while the next chunk's features are prepared on the other.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-live")
+        self._feature_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-features")
+        # How long insert_audio blocks on a full queue before dropping a chunk.
+        self.insert_timeout = insert_timeout
+        # Files longer than this (or of unknown length) are transcribed window by window.
+        self.stream_threshold_sec = stream_threshold_sec
+        self.stream_window_sec = stream_window_sec
+        # Extra keyword arguments for model.generate; part of the transcript cache key.
+        self.decode_options: dict = {}
+        self.cache = cache if cache is not None else TranscriptCache()
+        self.queue_wait = Gauge()
+        self.transcription_lag = Gauge()
+        self.rtf = Gauge()
+        self.feature_time = Gauge()
+        self.decode_time = Gauge()
+        self.reset_stats()
     
+    def close(self) -> None:
+        """Drop the loaded model and stop its worker threads; the instance is not reused."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._feature_executor.shutdown(wait=False, cancel_futures=True)
+        self.model = None
+
+    def reset_stats(self) -> None:
+        self.chunks_queued = 0
+        self.chunks_transcribed = 0
+        self.dropped_chunks = 0
+        self.queue_wait.reset()
+        self.transcription_lag.reset()
+        self.rtf.reset()
+        self.feature_time.reset()
+        self.decode_time.reset()
+
+    def stats(self) -> STTModelStats:
+        """Snapshot of live transcription counters and gauges."""
+        return STTModelStats(
+            chunks_queued=self.chunks_queued,
+            chunks_transcribed=self.chunks_transcribed,
+            chunks_dropped=self.dropped_chunks,
+            queue_depth=self._process_queue.qsize() if self._process_queue is not None else 0,
+            queue_capacity=self.queue_size,
+            queue_wait=self.queue_wait.snapshot(),
+            transcription_lag=self.transcription_lag.snapshot(),
+            rtf=self.rtf.snapshot(),
+            feature_sec=self.feature_time.snapshot(),
+            decode_sec=self.decode_time.snapshot(),
+            cache_hits=self.cache.hits,
+            cache_misses=self.cache.misses,
+        )
+
     def _update_loading_status(self, status: str) -> None:
         self.post_message(STTModelLoading(status))
 
@@ -48,80 +166,350 @@ class MLXAudioSTTModel(STTModelBase):
                 self.post_message(STTModelFail(str(e), "Loading Failed"))
     
     # async def change_model
-    async def submit_prompt(self, prompt: str) -> None:
-        """Extract audio files from the prompt and transcribe them."""
-        audio_paths = extract_audio_paths(prompt)
-        if not audio_paths:
-            self.post_message(STTModelFail("No audio files found", "No audio files in prompt"))
-            return
-        await self.transcribe_audio(audio_paths)
-        self.post_message(STTFullTranscriptionReady())
+    async def submit_prompt(self, prompt: str, message_target: MessagePump | None = None) -> None:
+        """Extract audio files from the prompt and transcribe them.
+
+        Messages go to `message_target` if given, else to the attached target.
+        """
+        with self.routed_to(message_target):
+            audio_paths = extract_audio_paths(prompt)
+            if not audio_paths:
+                self.post_message(STTModelFail("No audio files found", "No audio files in prompt"))
+                return
+            await self.transcribe_audio(audio_paths)
+            self.post_message(STTFullTranscriptionReady())
+
+    def _extract_features(self, samples: np.ndarray):
+        """CPU-side preparation of a 16 kHz mono waveform for `_decode_features`.
 
-    async def transcribe_audio(self, audio_path: Union[str, list[str]]) -> None:
-        """Transcribe a single audio file or a list of audio files."""
+        Call it on `_feature_executor`. Parakeet's log-mel spectrogram is
+        computed and evaluated here, on `feature_stream`. Whisper and Voxtral
+        build their features inside `generate`, so they get the waveform back
+        unchanged: for them the feature stage only decodes audio files, and
+        there is nothing to overlap for samples that are already decoded.
+        """
+        if hasattr(self.model, "decode_chunk"):
+            from mlx_audio.stt.models.parakeet.audio import log_mel_spectrogram  # Lazy import
+
+            with mx.stream(feature_stream):
+                mel = log_mel_spectrogram(mx.array(samples), self.model.preprocessor_config)
+                mx.eval(mel)
+            return mel
+        return samples
+
+    def _decode_features(self, features):
+        """Run the model on the output of `_extract_features`; call it on `_executor`."""
+        if hasattr(self.model, "decode_chunk"):
+            # Parakeet's generate() only accepts paths; decode the mel directly.
+            with mx.stream(generation_stream):
+                return self.model.decode(features)[0]
+        return self.model.generate(features, generation_stream=generation_stream, verbose=True, **self.decode_options)
+
+    def _generate_samples(self, samples: np.ndarray):
+        """Transcribe an already decoded 16 kHz mono waveform, blocking until done."""
+        features = self._feature_executor.submit(self._extract_features, samples).result()
+        return self._executor.submit(self._decode_features, features).result()
+
+    def _prepare(self, path: str) -> tuple[str | None, CachedTranscript | None, object | None]:
+        """Look a file up in the transcript cache, extracting its features on a miss.
+
+        Returns:
+            (cache key, cached transcript, features). Features are None for cache
+            hits and for long files that should be streamed instead.
+        """
+        duration = audio_duration(path)
+        streamed = duration is None or duration > self.stream_threshold_sec
+        options = {**self.decode_options, "stream_window_sec": self.stream_window_sec} if streamed else self.decode_options
+        try:
+            key = self.cache.key(path, self.model_name, options)
+        except OSError:
+            key = None
+        if key is not None and (cached := self.cache.get(key)) is not None:
+            return key, cached, None
+        if streamed:
+            return key, None, None
+        samples = load_normalized(path)
+        # File decoding and resampling run on the pool; MLX work stays on the
+        # feature thread (see `feature_stream`).
+        return key, None, self._feature_executor.submit(self._extract_features, samples).result()
+
+    def _post_window(self, start: float, end: float, text: str) -> None:
+        self.post_message(STTResponseUpdate(
+            f"`[{_format_timestamp(start)} → {_format_timestamp(end)}]` {text}\n\n",
+            start=start,
+            end=end,
+        ))
+
+    def _post_cached(self, transcript: CachedTranscript) -> None:
+        if transcript.streamed:
+            for segment in transcript.segments:
+                self._post_window(segment["start"], segment["end"], segment["text"])
+        else:
+            self.post_message(STTResponseUpdate(transcript.text))
+
+    async def transcribe_stream(self, path: str) -> CachedTranscript:
+        """Transcribe a file window by window with constant peak memory.
+
+        Each window is read (memory-mapped for raw WAV), transcribed and posted
+        as its own timestamped `STTResponseUpdate` before the next is read.
+
+        Returns:
+            The full transcript, with one segment per window.
+        """
+        segments = []
+        for start, samples in iter_audio_windows(path, window_sec=self.stream_window_sec):
+            if self._cancel_event.is_set():
+                break
+            end = start + samples.shape[0] / SAMPLE_RATE
+            text = self._generate_samples(samples).text.strip()
+            # Release the window's buffers before reading the next one.
+            del samples
+            mx.clear_cache()
+            if text:
+                segments.append({"start": start, "end": end, "text": text})
+                self._post_window(start, end, text)
+        return CachedTranscript(" ".join(s["text"] for s in segments), segments, streamed=True)
+
+    async def transcribe_audio(self, audio_path: Union[str, list[str]], max_workers: int = 4) -> None:
+        """Transcribe a single audio file or a list of audio files.
+
+        Files are decoded and resampled on a pool of CPU threads while the model
+        transcribes whichever file finished decoding first; each file is decoded
+        only once and memory-mapped from the audio cache after that. Results stream back
+        in completion order, so one long file does not hold up the rest, and at
+        most `max_workers + 1` decoded files are held in memory at a time.
+        Files longer than `stream_threshold_sec` are not decoded up front but
+        streamed through `transcribe_stream`.
+        """
         if self.model is None:
             self.post_message(STTModelFail("Model not loaded", "Model not loaded"))
             return
         if isinstance(audio_path, str):
             audio_path = [audio_path]
-        for idx, path in enumerate(audio_path):
-            try:
-                segments = self.model.generate(path, generation_stream=generation_stream, verbose=True)
-                if idx > 0:
-                    self.post_message(STTResponseUpdate("\n\n---\n\n"))
-                filename = Path(path).name
-                self.post_message(STTResponseUpdate(f"**{filename}**\n\n"))
-                self.post_message(STTResponseUpdate(segments.text))
-            except Exception as e:
-                import traceback
-                print(traceback.format_exc())
-                self.post_message(STTModelFail(str(e), f"Failed to transcribe {path}"))
-
-    async def transcribe(self) -> None:
         self._cancel_event.clear()
-        while not self._cancel_event.is_set():
-            try:
-                audio_path = self._process_queue.get(timeout=1.0)
-            except queue.Empty:
-                continue
+        total = len(audio_path)
+        pending = iter(audio_path)
+        decoded: queue.Queue[tuple[str, float, Future]] = queue.Queue()
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stt-decode") as pool:
+            def submit_next() -> bool:
+                if (path := next(pending, None)) is None:
+                    return False
+                submitted = time.perf_counter()
+                future = pool.submit(self._prepare, path)
+                future.add_done_callback(lambda f: decoded.put((path, submitted, f)))
+                return True
+
+            in_flight = sum(submit_next() for _ in range(max_workers + 1))
+            done = 0
+            while in_flight:
+                path, submitted, future = decoded.get()
+                in_flight -= 1
+                if self._cancel_event.is_set():
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    continue
+                in_flight += submit_next()
+                failed = False
+                try:
+                    key, cached, features = future.result()
+                    transcript = None
+                    if features is not None:
+                        result = self._executor.submit(self._decode_features, features).result()
+                        transcript = CachedTranscript(result.text, segments_of(result))
+                    if done > 0:
+                        self.post_message(STTResponseUpdate("\n\n---\n\n"))
+                    filename = Path(path).name
+                    self.post_message(STTResponseUpdate(f"**{filename}**\n\n"))
+                    if cached is not None:
+                        self._post_cached(cached)
+                    elif transcript is None:
+                        transcript = await self.transcribe_stream(path)
+                    else:
+                        self.post_message(STTResponseUpdate(transcript.text))
+                    if transcript is not None and key is not None and not self._cancel_event.is_set():
+                        self.cache.put(key, transcript)
+                except Exception as e:
+                    import traceback
+                    print(traceback.format_exc())
+                    failed = True
+                    self.post_message(STTModelFail(str(e), f"Failed to transcribe {path}"))
+                done += 1
+                self.post_message(STTBatchProgress(
+                    done=done,
+                    total=total,
+                    path=path,
+                    elapsed_sec=time.perf_counter() - submitted,
+                    failed=failed,
+                ))
 
+    def _live_queue(self) -> asyncio.Queue[QueuedAudio | None]:
+        loop = asyncio.get_running_loop()
+        if self._queue_loop is not loop:
+            self._process_queue = asyncio.Queue(maxsize=self.queue_size)
+            self._queue_loop = loop
+        return self._process_queue
+
+    def _live_features(self, item: QueuedAudio):
+        samples = item.samples if item.samples is not None else decode_audio(item.path)
+        return self._extract_features(samples)
+
+    async def _feature_stage(
+        self,
+        process_queue: asyncio.Queue[QueuedAudio | None],
+        ready: asyncio.Queue,
+    ) -> None:
+        """Extract features for queued chunks on the helper thread, one chunk ahead of decoding."""
+        loop = asyncio.get_running_loop()
+        while not self._cancel_event.is_set():
+            item = await process_queue.get()
             # Sentinel value signals end of input
-            if audio_path is None:
+            if item is None or self._cancel_event.is_set():
                 break
+            self.queue_wait.observe(time.monotonic() - item.queued_at)
+            started = time.perf_counter()
+            try:
+                features = await loop.run_in_executor(self._feature_executor, self._live_features, item)
+            except Exception as e:
+                await ready.put((item, None, 0.0, e))
+                continue
+            feature_sec = time.perf_counter() - started
+            self.feature_time.observe(feature_sec)
+            await ready.put((item, features, feature_sec, None))
+        # The decode stage keeps draining `ready` until it sees this.
+        await ready.put(None)
 
+    async def _decode_stage(self, ready: asyncio.Queue) -> None:
+        """Decode prepared chunks on the model thread and post their text."""
+        loop = asyncio.get_running_loop()
+        while (prepared := await ready.get()) is not None:
+            if self._cancel_event.is_set():
+                continue
+            item, features, feature_sec, error = prepared
             self._is_generating = True
             try:
-                segments = self.model.generate(audio_path, verbose=True)
+                if error is not None:
+                    raise error
+                started = time.perf_counter()
+                segments = await loop.run_in_executor(self._executor, self._decode_features, features)
+                elapsed = time.perf_counter() - started
+                del features
+                self.decode_time.observe(elapsed)
                 transcription = segments.text
                 self.post_message(STTResponseUpdate(transcription))
+                self.chunks_transcribed += 1
+                if item.duration > 0:
+                    self.rtf.observe((feature_sec + elapsed) / item.duration)
+                if item.captured_at is not None:
+                    self.transcription_lag.observe(time.monotonic() - item.captured_at)
+                self.post_message(STTChunkTranscribed(
+                    audio_sec=item.duration,
+                    elapsed_sec=elapsed,
+                    feature_sec=feature_sec,
+                ))
             except Exception as e:
                 import traceback
                 print(traceback.format_exc())
                 self.post_message(STTModelFail(str(e), "Transcription Failed"))
             finally:
                 self._is_generating = False
-        
-        self._is_generating = False
+
+    async def transcribe(self, message_target: MessagePump | None = None) -> None:
+        """Transcribe live chunks as they are inserted until `finish()` or `cancel()`.
+
+        Runs on the same event loop as the producer calling `insert_audio`, as
+        two stages: features for chunk N+1 are extracted on a helper thread
+        while chunk N decodes on the model's thread. Only Parakeet has
+        features to extract; for Whisper and Voxtral the first stage only
+        decodes chunks queued as files. Per-stage timings are in `stats()`. Messages go to `message_target` if given, else to the
+        attached target.
+        """
+        with self.routed_to(message_target):
+            await self._transcribe_live()
+
+    async def _transcribe_live(self) -> None:
+        process_queue = self._live_queue()
+        # Holds at most one prepared chunk, so features never run far ahead of decoding.
+        ready: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._cancel_event.clear()
+        self._transcribing = True
+        try:
+            await asyncio.gather(
+                self._feature_stage(process_queue, ready),
+                self._decode_stage(ready),
+            )
+        finally:
+            self._transcribing = False
+            self._is_generating = False
+            # Leave nothing behind (e.g. chunks after a cancel) for the next recording.
+            while not process_queue.empty():
+                process_queue.get_nowait()
+
         self.post_message(STTFullTranscriptionReady())
-                
 
-    async def insert_audio(self, audio_path: str) -> None:
+    async def _enqueue(self, item: QueuedAudio) -> None:
+        """Block for up to `insert_timeout` on a full queue, then drop the oldest chunk."""
+        process_queue = self._live_queue()
+        self.chunks_queued += 1
         try:
-            self._process_queue.put(audio_path)
-        except queue.Full:
-            self._process_queue.get()
+            await asyncio.wait_for(process_queue.put(item), self.insert_timeout)
+        except TimeoutError:
+            self.dropped_chunks += 1
+            try:
+                process_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                pass
             try:
-                self._process_queue.put(audio_path)
-            except queue.Full:
+                process_queue.put_nowait(item)
+            except asyncio.QueueFull:
                 pass
-        
+
+    async def insert_audio(
+        self,
+        audio_path: str,
+        duration: float | None = None,
+        captured_at: float | None = None,
+    ) -> None:
+        """Queue a recorded chunk for transcription.
+
+        Blocks for up to `insert_timeout` seconds when the queue is full so the
+        recorder can coalesce audio upstream; only then is the oldest chunk dropped.
+
+        Args:
+            audio_path: WAV file holding the chunk.
+            duration: Chunk length in seconds; read from the WAV header if omitted.
+            captured_at: `time.monotonic()` at which the chunk finished recording,
+                used to measure transcription lag.
+        """
+        if duration is None:
+            duration = _wav_duration(audio_path)
+        await self._enqueue(QueuedAudio(audio_path, duration, captured_at))
+
+    async def insert_samples(self, samples: np.ndarray, captured_at: float | None = None) -> None:
+        """Queue a recorded chunk of 16 kHz mono samples, skipping the WAV round trip.
+
+        Same back-pressure as `insert_audio`.
+        """
+        await self._enqueue(QueuedAudio(None, samples.shape[0] / SAMPLE_RATE, captured_at, samples=samples))
+
     async def finish(self) -> None:
         """Signal that no more audio will be added."""
-        self._process_queue.put(None)
+        await self._live_queue().put(None)
+
+    def _wake(self) -> None:
+        """Unblock a waiting `transcribe()` so it sees the cancellation immediately."""
+        if self._process_queue is None:
+            return
+        try:
+            self._process_queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self._process_queue.get_nowait()
+            self._process_queue.put_nowait(None)
 
     async def cancel(self) -> bool:
         if not self._cancel_event.is_set():
             self._cancel_event.set()
+            if self._transcribing and self._queue_loop is not None:
+                self._queue_loop.call_soon_threadsafe(self._wake)
             return True
         return False
             
\ No newline at end of file
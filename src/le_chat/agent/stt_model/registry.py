@@ -0,0 +1,104 @@
+"""Process-wide registry that keeps loaded STT models resident between screens."""
+from dataclasses import dataclass, field
+import gc
+import threading
+from typing import Callable
+
+import mlx.core as mx
+from textual.message_pump import MessagePump
+
+from le_chat.agent.stt_model.base import STTModelReady
+from le_chat.agent.stt_model.model import MLXAudioSTTModel
+
+
+@dataclass
+class _Entry:
+    model: MLXAudioSTTModel | None = None
+    targets: list[MessagePump | None] = field(default_factory=list)
+    idle_timer: threading.Timer | None = None
+    load_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class STTModelRegistry:
+    """Shares one loaded model per name between everything that uses it.
+
+    Every `acquire` must be paired with a `release`. Once the last holder
+    releases a model it stays loaded for `idle_timeout` seconds, so coming
+    back to STT mode is instant, and is unloaded after that to reclaim memory.
+    """
+
+    def __init__(
+        self,
+        idle_timeout: float = 300.0,
+        factory: Callable[[str], MLXAudioSTTModel] = MLXAudioSTTModel,
+    ) -> None:
+        self.idle_timeout = idle_timeout
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._entries: dict[str, _Entry] = {}
+
+    def is_loaded(self, model_name: str) -> bool:
+        entry = self._entries.get(model_name)
+        return entry is not None and entry.model is not None and entry.model.model is not None
+
+    def acquire(self, model_name: str, message_target: MessagePump | None = None) -> MLXAudioSTTModel:
+        """Return the shared model for `model_name`, loading it if needed.
+
+        Blocks while the model loads, so call it from a worker thread. The
+        model posts its messages to `message_target` until that holder releases it.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(model_name, _Entry())
+            entry.targets.append(message_target)
+            if entry.idle_timer is not None:
+                entry.idle_timer.cancel()
+                entry.idle_timer = None
+        with entry.load_lock:
+            if entry.model is None or entry.model.model is None:
+                # Not loaded yet, or a previous load failed: (re)load it.
+                entry.model = self._factory(model_name)
+                entry.model.start(message_target)
+            else:
+                entry.model.attach(message_target)
+                entry.model.post_message(STTModelReady())
+            return entry.model
+
+    def release(self, model: MLXAudioSTTModel, message_target: MessagePump | None = None) -> None:
+        """Give up a model obtained from `acquire`; unloads it after the idle timeout."""
+        with self._lock:
+            entry = self._entries.get(model.model_name)
+            if entry is None or entry.model is not model or message_target not in entry.targets:
+                return
+            entry.targets.remove(message_target)
+            # Route messages back to whoever still holds the model, if anyone.
+            model.attach(entry.targets[-1] if entry.targets else None)
+            if entry.targets:
+                return
+            entry.idle_timer = threading.Timer(self.idle_timeout, self._unload, args=(model.model_name, entry))
+            entry.idle_timer.daemon = True
+            entry.idle_timer.start()
+
+    def _unload(self, model_name: str, entry: _Entry) -> None:
+        with self._lock:
+            if self._entries.get(model_name) is not entry or entry.targets:
+                return
+            del self._entries[model_name]
+        if entry.model is not None:
+            # The entry is gone from the registry, so this instance is never handed out again.
+            entry.model.close()
+            entry.model = None
+        gc.collect()
+        mx.clear_cache()
+
+    def clear(self) -> None:
+        """Unload every idle model now."""
+        with self._lock:
+            idle = [(name, entry) for name, entry in self._entries.items() if not entry.targets]
+        for name, entry in idle:
+            if entry.idle_timer is not None:
+                entry.idle_timer.cancel()
+            self._unload(name, entry)
+
+
+stt_models = STTModelRegistry()
+"""The registry shared by all STT screens."""
@@ -1,3 +1,4 @@
+import asyncio
 from dataclasses import dataclass
 from pathlib import Path
 import queue
@@ -5,7 +6,9 @@ import threading
 import time
 import wave
 import numpy as np
-import sounddevice as sd
+
+from le_chat.audio_sources import AudioSource, MicrophoneSource
+from le_chat.utils.metrics import Gauge, GaugeSnapshot
 
 
 @dataclass
@@ -14,6 +17,22 @@ class AudioChunk:
     t0: float
     t1: float
     samples: np.ndarray
+    queued_at: float = 0.0
+
+
+@dataclass
+class CaptureStats:
+    """Point-in-time view of the capture side of the pipeline."""
+    frames_captured: int
+    frames_dropped: int
+    input_overflows: int
+    frames_queue_depth: int
+    frames_queue_capacity: int
+    chunks_emitted: int
+    chunks_dropped: int
+    chunks_queue_depth: int
+    chunks_queue_capacity: int
+    chunk_wait: GaugeSnapshot
 
 class AudioProcessor:
     def __init__(
@@ -25,71 +44,106 @@ class AudioProcessor:
         dtype: str = "float32",
         max_queue_chunks: int = 4,
         drop_oldest_on_overflow: bool = True,
+        min_chunk_sec: float = 2.0,
+        max_chunk_sec: float = 30.0,
+        source: AudioSource | None = None,
+        lossless: bool | None = None,
     ) -> None:
+        """
+        Args:
+            source: Where audio comes from; defaults to the microphone.
+            lossless: Block instead of dropping when queues are full. Defaults to
+                True for non-realtime sources (file replay, synthetic signals) so
+                replays measure throughput rather than losing audio.
+        """
         assert channels == 1, "Only mono audio is supported."
+        assert min_chunk_sec <= chunk_sec <= max_chunk_sec, "chunk_sec must lie within [min_chunk_sec, max_chunk_sec]."
         self.sr = sample_rate
         self.channels = channels
         self.chunk_sec = chunk_sec
+        self.min_chunk_sec = min_chunk_sec
+        self.max_chunk_sec = max_chunk_sec
         self.block_sec = block_sec
         self.dtype = dtype
         
         self.chunk_samples = int(round(self.sr * self.chunk_sec))
+        self.max_chunk_samples = int(round(self.sr * self.max_chunk_sec))
         self.block_samples = int(round(self.sr * self.block_sec))
 
+        self.source = source if source is not None else MicrophoneSource(dtype=dtype)
+        self._lossless = lossless if lossless is not None else not self.source.realtime
+
+        # Smoothed transcription real-time factor (processing time / audio time).
+        self.rtf: float | None = None
+        self.chunk_wait = Gauge()
+        self.reset_stats()
+
         self._stop = threading.Event()
         self._frames_q = queue.Queue(maxsize=max_queue_chunks * 50)
         self._chunks_q = queue.Queue(maxsize=max_queue_chunks)
 
         self._drop_oldest = drop_oldest_on_overflow
         self._worker = None
-        self._stream = None
+        self._started = False
         self._flush_partial = False
+        self._ended = threading.Event()
+        # Event loop and event of an `achunks()` consumer, woken whenever a chunk is queued.
+        self._waiter: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
     
     def start(self):
         self._stop.clear()
+        self.reset_stats()
+        self._ended.clear()
         self._worker = threading.Thread(target=self._chunker_loop, daemon=True)
         self._worker.start()
+        # Mark started first: an unpaced source can run dry (and stop us) inside start().
+        self._started = True
+        self.source.start(self.sr, self.block_samples, self._on_block, self._on_source_end)
 
-        def callback(indata, frames, time_info, status):
-            if status:
-                pass # Handle status if needed
+    @property
+    def ended(self) -> threading.Event:
+        """Set once a finite source (file, synthetic) has delivered all its audio."""
+        return self._ended
 
-            if self._stop.is_set():
-                return
-            x = indata[:, 0].copy()
-            try:
-                self._frames_q.put_nowait((time.monotonic(), x))
-            except queue.Full:
-                pass
-        
-        self._stream = sd.InputStream(
-            samplerate=self.sr,
-            channels=self.channels,
-            dtype=self.dtype,
-            blocksize=self.block_samples,
-            callback=callback,
-        )
+    def _on_block(self, x: np.ndarray, ts: float, overflow: bool) -> None:
+        if overflow:
+            self.input_overflows += 1
+        if self._stop.is_set():
+            return
+        frames = x.shape[0]
+        try:
+            if self._lossless:
+                self._frames_q.put((ts, x))
+            else:
+                self._frames_q.put_nowait((ts, x))
+            self.frames_captured += frames
+        except queue.Full:
+            self.frames_dropped += frames
 
-        self._stream.start()
+    def _on_source_end(self) -> None:
+        self._ended.set()
+        self.stop(flush_partial=True)
 
     def stop(self, flush_partial: bool = False):
+        if not self._started:
+            return
+        self._started = False
         self._stop.set()
         self._flush_partial = flush_partial
-        if self._stream is not None:
-            try:
-                self._stream.stop()
-            finally:
-                self._stream.close()
-            self._stream = None
+        self.source.stop()
         
         # chunker exit
         try:
-            self._frames_q.put_nowait((None, None))
+            if self._lossless:
+                self._frames_q.put((None, None))
+            else:
+                self._frames_q.put_nowait((None, None))
         except queue.Full:
             pass
 
         if self._worker is not None:
-            self._worker.join(timeout=1.0)
+            # A lossless chunker may be waiting on the consumer; let it finish.
+            self._worker.join(timeout=None if self._lossless and flush_partial else 1.0)
             self._worker = None
         
         if not flush_partial:
@@ -97,7 +151,10 @@ class AudioProcessor:
         
         # end of stream marker for consumer
         try:
-            self._chunks_q.put_nowait(None)
+            if self._lossless:
+                self._chunks_q.put(None)
+            else:
+                self._chunks_q.put_nowait(None)
         except queue.Full:
             if self._drop_oldest:
                 try:
@@ -108,14 +165,106 @@ class AudioProcessor:
                     self._chunks_q.put_nowait(None)
                 except queue.Full:
                     pass
+        self._notify()
     
+    def reset_stats(self) -> None:
+        self.dropped_chunks = 0
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.input_overflows = 0
+        self.chunks_emitted = 0
+        self.chunk_wait.reset()
+
+    def stats(self) -> CaptureStats:
+        """Snapshot of capture counters and queue gauges."""
+        return CaptureStats(
+            frames_captured=self.frames_captured,
+            frames_dropped=self.frames_dropped,
+            input_overflows=self.input_overflows,
+            frames_queue_depth=self._frames_q.qsize(),
+            frames_queue_capacity=self._frames_q.maxsize,
+            chunks_emitted=self.chunks_emitted,
+            chunks_dropped=self.dropped_chunks,
+            chunks_queue_depth=self._chunks_q.qsize(),
+            chunks_queue_capacity=self._chunks_q.maxsize,
+            chunk_wait=self.chunk_wait.snapshot(),
+        )
+
+    def set_chunk_sec(self, chunk_sec: float) -> None:
+        """Change the target chunk length; takes effect on the next emitted chunk."""
+        chunk_sec = min(max(chunk_sec, self.min_chunk_sec), self.max_chunk_sec)
+        self.chunk_sec = chunk_sec
+        self.chunk_samples = int(round(self.sr * chunk_sec))
+
+    def report_rtf(
+        self,
+        rtf: float,
+        high: float = 0.75,
+        low: float = 0.3,
+        smoothing: float = 0.5,
+    ) -> float:
+        """Feed back the measured real-time factor of a transcribed chunk.
+
+        Chunks grow while the consumer is falling behind (fewer model calls,
+        less fixed overhead per second of audio) and shrink again when it has
+        plenty of headroom, to keep latency low.
+
+        Args:
+            rtf: Processing time divided by audio duration for one chunk.
+            high: Smoothed RTF above which chunks are lengthened.
+            low: Smoothed RTF below which chunks are shortened.
+            smoothing: Weight of the newest measurement in the moving average.
+
+        Returns:
+            The chunk length in seconds that will be used from now on.
+        """
+        self.rtf = rtf if self.rtf is None else smoothing * rtf + (1 - smoothing) * self.rtf
+        if self.rtf > high:
+            self.set_chunk_sec(self.chunk_sec * 1.5)
+        elif self.rtf < low:
+            self.set_chunk_sec(self.chunk_sec / 1.25)
+        return self.chunk_sec
+
     def chunks(self):
         while True:
             item = self._chunks_q.get()
             if item is None:
                 return
+            self.chunk_wait.observe(time.monotonic() - item.queued_at)
             yield item
 
+    async def achunks(self):
+        """Like `chunks()`, for a consumer running on an event loop.
+
+        The chunker thread wakes the loop with `call_soon_threadsafe` as soon
+        as a chunk (or the end of stream) is queued, so nothing blocks the loop
+        and nothing polls.
+        """
+        ready = asyncio.Event()
+        self._waiter = (asyncio.get_running_loop(), ready)
+        try:
+            while True:
+                ready.clear()
+                try:
+                    item = self._chunks_q.get_nowait()
+                except queue.Empty:
+                    await ready.wait()
+                    continue
+                if item is None:
+                    return
+                self.chunk_wait.observe(time.monotonic() - item.queued_at)
+                yield item
+        finally:
+            self._waiter = None
+
+    def _notify(self) -> None:
+        if (waiter := self._waiter) is not None:
+            loop, ready = waiter
+            try:
+                loop.call_soon_threadsafe(ready.set)
+            except RuntimeError:
+                pass  # The consumer's loop has already closed.
+
     def _chunker_loop(self):
         buf = np.empty((0,), dtype=np.float32)
         t0 = None
@@ -135,9 +284,17 @@ class AudioProcessor:
             buf = np.concatenate([buf, x], axis=0)
 
             while buf.shape[0] >= self.chunk_samples:
-                chunk = buf[:self.chunk_samples]
-                buf = buf[self.chunk_samples: ]
-                t1 = t0 + (self.chunk_samples / self.sr)
+                # Consumer is behind: keep accumulating so the pending audio is
+                # coalesced into one longer chunk instead of being dropped.
+                if self._chunks_q.full() and buf.shape[0] < self.max_chunk_samples:
+                    break
+                if self._chunks_q.full() or buf.shape[0] >= 2 * self.chunk_samples:
+                    n = min(buf.shape[0], self.max_chunk_samples)
+                else:
+                    n = self.chunk_samples
+                chunk = buf[:n]
+                buf = buf[n:]
+                t1 = t0 + self._wall_sec(n)
                 out = AudioChunk(seq=seq, t0=t0, t1=t1, samples=chunk)
                 seq += 1
                 t0 = t1
@@ -146,24 +303,34 @@ class AudioProcessor:
 
         if self._flush_partial and buf.shape[0] > 0:
             # Flush any remaining audio as a final partial chunk.
-            t1 = t0 + (buf.shape[0] / self.sr) if t0 is not None else 0.0
+            t1 = t0 + self._wall_sec(buf.shape[0]) if t0 is not None else 0.0
             out = AudioChunk(seq=seq, t0=t0 or 0.0, t1=t1, samples=buf)
             self._put_chunk(out)
 
+    def _wall_sec(self, n_samples: int) -> float:
+        """Wall-clock time it takes the source to deliver `n_samples`."""
+        return n_samples / self.sr / self.source.speed
+
     def _put_chunk(self, chunk: AudioChunk):
-        if not self._chunks_q.full():
+        self.chunks_emitted += 1
+        chunk.queued_at = time.monotonic()
+        if self._lossless:
+            self._chunks_q.put(chunk)
+        elif not self._chunks_q.full():
             self._chunks_q.put_nowait(chunk)
-            return
-        
-        if self._drop_oldest:
-            try:
-                self._chunks_q.get_nowait()
-            except queue.Empty:
-                pass
-            try:
-                self._chunks_q.put_nowait(chunk)
-            except queue.Full:
-                pass
+        else:
+            # Last resort: the consumer could not keep up even with max-length chunks.
+            self.dropped_chunks += 1
+            if self._drop_oldest:
+                try:
+                    self._chunks_q.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    self._chunks_q.put_nowait(chunk)
+                except queue.Full:
+                    pass
+        self._notify()
 
     @staticmethod
     def _drain_queue(q: queue.Queue):
@@ -185,13 +352,17 @@ class AudioProcessor:
             wf.setframerate(sample_rate)
             wf.writeframes(pcm16.tobytes())
 
+    def save_chunk(self, chunk: AudioChunk, output_path: str | Path) -> str:
+        """Write one chunk next to `output_path` and return its absolute path."""
+        chunk_path = Path(output_path).with_name(
+            f"{Path(output_path).stem}_chunk{chunk.seq:04d}.wav"
+        )
+        self._write_wav(chunk_path, chunk.samples, self.sr)
+        return str(chunk_path.resolve())
+
     def chunk_and_save_wav(self, output_path: str | Path):
         for chunk in self.chunks():
-            chunk_path = Path(output_path).with_name(
-                f"{Path(output_path).stem}_chunk{chunk.seq:04d}.wav"
-            )
-            self._write_wav(chunk_path, chunk.samples, self.sr)
-            yield str(chunk_path.resolve())
+            yield self.save_chunk(chunk, output_path)
         
     def record_wav(self, output_path: str | Path, duration_sec: float):
         """
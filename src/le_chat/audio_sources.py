@@ -0,0 +1,285 @@
+"""Audio sources that feed `AudioProcessor`.
+
+A source pushes mono float32 blocks into a callback at (roughly) the pace it
+was asked for. The microphone is the live default; file replay and synthetic
+signals make the same chunking and transcription path runnable headless, and
+faster than real time.
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+import threading
+import time
+import wave
+from typing import Callable, Iterator, Literal
+
+import numpy as np
+
+from le_chat.utils.audio_io import StreamResampler, resample
+
+BlockCallback = Callable[[np.ndarray, float, bool], None]
+"""Called with (samples, capture timestamp, input_overflow) for every block."""
+
+
+class AudioSource(ABC):
+    """Something that produces mono audio blocks."""
+
+    speed: float = 1.0
+    """Playback speed relative to real time (`inf` means as fast as possible)."""
+
+    realtime: bool = True
+    """Whether blocks arrive on a clock that cannot wait (e.g. a sound card)."""
+
+    @abstractmethod
+    def start(
+        self,
+        sample_rate: int,
+        block_samples: int,
+        on_block: BlockCallback,
+        on_end: Callable[[], None],
+    ) -> None:
+        """Begin delivering blocks; `on_end` is called once a finite source runs dry."""
+
+    @abstractmethod
+    def stop(self) -> None:
+        """Stop delivering blocks and release any device or thread."""
+
+
+class MicrophoneSource(AudioSource):
+    """Live capture from the default input device via sounddevice."""
+
+    def __init__(self, device: int | str | None = None, dtype: str = "float32") -> None:
+        self.device = device
+        self.dtype = dtype
+        self._stream = None
+
+    def start(self, sample_rate, block_samples, on_block, on_end) -> None:
+        # Imported lazily so headless machines without PortAudio can use other sources.
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            on_block(indata[:, 0].copy(), time.monotonic(), bool(status and status.input_overflow))
+
+        self._stream = sd.InputStream(
+            samplerate=sample_rate,
+            channels=1,
+            dtype=self.dtype,
+            blocksize=block_samples,
+            device=self.device,
+            callback=callback,
+        )
+        self._stream.start()
+
+    def stop(self) -> None:
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            finally:
+                self._stream.close()
+            self._stream = None
+
+
+class _PacedSource(AudioSource):
+    """Delivers blocks from a generator on a thread, paced to `speed` x real time."""
+
+    realtime = False
+
+    def __init__(self, speed: float = 1.0) -> None:
+        assert speed > 0, "speed must be positive."
+        self.speed = speed
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @abstractmethod
+    def _blocks(self, sample_rate: int, block_samples: int) -> Iterator[np.ndarray]:
+        """Yield float32 blocks of `block_samples` (the last may be shorter)."""
+
+    def start(self, sample_rate, block_samples, on_block, on_end) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(sample_rate, block_samples, on_block, on_end), daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, sample_rate, block_samples, on_block, on_end) -> None:
+        started = time.monotonic()
+        delivered = 0
+        for block in self._blocks(sample_rate, block_samples):
+            if self._stop.is_set():
+                return
+            if self.speed != float("inf"):
+                due = started + delivered / sample_rate / self.speed
+                if (delay := due - time.monotonic()) > 0:
+                    # Wake early on stop rather than sleeping out the block.
+                    if self._stop.wait(delay):
+                        return
+            delivered += block.shape[0]
+            on_block(block, time.monotonic(), False)
+        if not self._stop.is_set():
+            on_end()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+
+_PCM_SCALE = {1: 128.0, 2: 32768.0, 4: 2147483648.0}
+_PCM_DTYPE = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def _pcm_to_float(raw: bytes, sample_width: int, channels: int) -> np.ndarray:
+    if sample_width not in _PCM_DTYPE:
+        raise ValueError(f"Unsupported PCM sample width: {sample_width} bytes")
+    pcm = np.frombuffer(raw, dtype=_PCM_DTYPE[sample_width]).astype(np.float32)
+    if sample_width == 1:
+        pcm -= 128.0  # 8-bit WAV is unsigned
+    pcm /= _PCM_SCALE[sample_width]
+    if channels > 1:
+        pcm = pcm.reshape(-1, channels).mean(axis=1)
+    return pcm
+
+
+class FileSource(_PacedSource):
+    """Replays a WAV file, or headerless PCM, as if it were being recorded.
+
+    Args:
+        path: `.wav` file, or raw little-endian PCM for any other extension.
+        speed: Replay speed relative to real time; `float("inf")` for no pacing.
+        pcm_sample_rate: Sample rate of raw PCM input.
+        pcm_sample_width: Bytes per sample of raw PCM input (1, 2 or 4).
+        pcm_channels: Interleaved channel count of raw PCM input.
+        loop: Restart from the beginning instead of ending.
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        speed: float = 1.0,
+        pcm_sample_rate: int = 16000,
+        pcm_sample_width: int = 2,
+        pcm_channels: int = 1,
+        loop: bool = False,
+    ) -> None:
+        super().__init__(speed)
+        self.path = Path(path)
+        self.pcm_sample_rate = pcm_sample_rate
+        self.pcm_sample_width = pcm_sample_width
+        self.pcm_channels = pcm_channels
+        self.loop = loop
+
+    def _read_frames(self, seconds: float) -> Iterator[tuple[np.ndarray, int]]:
+        """Yield (mono float32 samples, source rate) in pieces of about `seconds`."""
+        if self.path.suffix.lower() == ".wav":
+            with wave.open(str(self.path), "rb") as wf:
+                rate, width, channels = wf.getframerate(), wf.getsampwidth(), wf.getnchannels()
+                n = max(1, int(rate * seconds))
+                while raw := wf.readframes(n):
+                    yield _pcm_to_float(raw, width, channels), rate
+        else:
+            rate, width, channels = self.pcm_sample_rate, self.pcm_sample_width, self.pcm_channels
+            n = max(1, int(rate * seconds)) * width * channels
+            with self.path.open("rb") as f:
+                while raw := f.read(n):
+                    raw = raw[: len(raw) - len(raw) % (width * channels)]
+                    yield _pcm_to_float(raw, width, channels), rate
+
+    def _blocks(self, sample_rate, block_samples):
+        pending = np.empty((0,), dtype=np.float32)
+        while True:
+            # Decode about a second at a time so memory stays flat for long files.
+            resampler: StreamResampler | None = None
+            for samples, rate in self._read_frames(1.0):
+                if resampler is None:
+                    resampler = StreamResampler(rate, sample_rate)
+                pending = np.concatenate([pending, resampler.push(samples)])
+                while pending.shape[0] >= block_samples:
+                    yield pending[:block_samples]
+                    pending = pending[block_samples:]
+            if resampler is not None:
+                pending = np.concatenate([pending, resampler.flush()])
+            if not self.loop or self._stop.is_set():
+                break
+        if pending.shape[0]:
+            yield pending
+
+
+class ArraySource(_PacedSource):
+    """Replays an in-memory mono waveform, e.g. a decoded benchmark file.
+
+    Args:
+        samples: Mono float32 samples.
+        sample_rate: Rate of `samples`; resampled to the processor's rate.
+        speed: Replay speed relative to real time; `float("inf")` for no pacing.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = 16000, speed: float = 1.0) -> None:
+        super().__init__(speed)
+        self.samples = samples
+        self.sample_rate = sample_rate
+
+    def _blocks(self, sample_rate, block_samples):
+        samples = resample(np.asarray(self.samples, dtype=np.float32), self.sample_rate, sample_rate)
+        for start in range(0, samples.shape[0], block_samples):
+            yield samples[start:start + block_samples]
+
+
+class SyntheticSource(_PacedSource):
+    """Generates a test signal.
+
+    Args:
+        kind: "tone" (sine at `frequency`), "noise" (white) or "silence".
+        duration_sec: Total length, or None to run until stopped.
+        frequency: Tone frequency in Hz.
+        amplitude: Peak amplitude in [0, 1].
+        speed: Generation speed relative to real time.
+        seed: Seed for the noise generator.
+    """
+
+    def __init__(
+        self,
+        kind: Literal["tone", "noise", "silence"] = "tone",
+        duration_sec: float | None = 10.0,
+        frequency: float = 440.0,
+        amplitude: float = 0.2,
+        speed: float = 1.0,
+        seed: int = 0,
+    ) -> None:
+        super().__init__(speed)
+        self.kind = kind
+        self.duration_sec = duration_sec
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.seed = seed
+
+    def _blocks(self, sample_rate, block_samples):
+        rng = np.random.default_rng(self.seed)
+        total = None if self.duration_sec is None else int(round(self.duration_sec * sample_rate))
+        offset = 0
+        while total is None or offset < total:
+            n = block_samples if total is None else min(block_samples, total - offset)
+            if self.kind == "tone":
+                t = (offset + np.arange(n)) / sample_rate
+                block = self.amplitude * np.sin(2 * np.pi * self.frequency * t)
+            elif self.kind == "noise":
+                block = self.amplitude * rng.uniform(-1.0, 1.0, n)
+            else:
+                block = np.zeros(n)
+            offset += n
+            yield block.astype(np.float32)
+
+
+def parse_source(spec: str, speed: float = 1.0) -> AudioSource:
+    """Build a source from a command-line style spec.
+
+    `mic`, `mic:<device>`, `file:<path>`, `tone[:<seconds>]`, `noise[:<seconds>]`
+    or `silence[:<seconds>]`.
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "mic":
+        return MicrophoneSource(device=arg or None)
+    if kind == "file":
+        return FileSource(arg, speed=speed)
+    if kind in ("tone", "noise", "silence"):
+        return SyntheticSource(kind, duration_sec=float(arg) if arg else 10.0, speed=speed)
+    raise ValueError(f"Unknown audio source {spec!r}")
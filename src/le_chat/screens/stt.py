@@ -1,12 +1,16 @@
+from pathlib import Path
+
 from textual import containers, on, work, events
 from textual.reactive import var
 from textual.screen import Screen
+from textual.timer import Timer
 
 import mlx.core as mx
 
-from le_chat.agent.stt_model.base import STTFullTranscriptionReady, STTModelFail, STTModelLoading, STTModelReady
+from le_chat.agent.stt_model.base import STTBatchProgress, STTChunkTranscribed, STTFullTranscriptionReady, STTModelFail, STTModelLoading, STTModelReady
 from le_chat.audio import AudioProcessor
-from le_chat.utils.prompt.extract import validate_input_files
+from le_chat.audio_sources import AudioSource
+from le_chat.utils.prompt.extract import validate_input_files_async
 from le_chat.widgets.prompt import Prompt, UserInputSubmitted
 from le_chat.widgets.stt_response import STTResponse, STTResponseUpdate
 from le_chat.widgets.non_selectable_label import NonSelectableLabel
@@ -27,16 +31,20 @@ class SttScreen(Screen):
     # mlx-community/Voxtral-Mini-3B-2507-bf16
     model_name: var[str | None] = var("mlx-community/parakeet-tdt-0.6b-v2")
 
-    def __init__(self, sample_rate=16000, chunk_sec=5.0):
+    def __init__(self, sample_rate=16000, chunk_sec=5.0, source: AudioSource | None = None):
         super().__init__()
         self.sample_rate = sample_rate
         self.chunk_sec = chunk_sec
-        self.audio_processor = AudioProcessor(chunk_sec=self.chunk_sec, sample_rate=self.sample_rate)
+        self.audio_processor = AudioProcessor(chunk_sec=self.chunk_sec, sample_rate=self.sample_rate, source=source)
         self._recording: bool = False
         self._model_response: STTResponse | None = None
+        self._stats_timer: Timer | None = None
+        self._unmounted = False
 
     async def on_mount(self) -> None:
-        self.post_message(STTModelLoading(loading_message="Loading STT Model..."))
+        from le_chat.agent.stt_model import stt_models
+        if not stt_models.is_loaded(self.model_name):
+            self.post_message(STTModelLoading(loading_message="Loading STT Model..."))
         # Focus the stt-view so spacebar recording works immediately
         self.query_one("#stt-view").focus()
         # Start the STT model load immediately after mount.
@@ -44,20 +52,41 @@ class SttScreen(Screen):
 
     @work(thread=True)
     def load_model(self) -> None:
-        from le_chat.agent.stt_model import MLXAudioSTTModel as STTModel
-        self.audio_model = STTModel(self.model_name)
+        from le_chat.agent.stt_model import stt_models
         print("Starting STT model...")
-        self.audio_model.start(self)
+        # Shared with other STT screens; stays resident for a while after we leave.
+        audio_model = stt_models.acquire(self.model_name, self)
+        self.app.call_from_thread(self._model_acquired, audio_model)
 
-    @work(thread=True)
+    def _model_acquired(self, audio_model) -> None:
+        from le_chat.agent.stt_model import stt_models
+        if self._unmounted:
+            # Left before the model was ready; nothing else will release it.
+            stt_models.release(audio_model, self)
+            return
+        self.audio_model = audio_model
+
+    async def on_unmount(self) -> None:
+        self._unmounted = True
+        if self._recording:
+            self._recording = False
+            self.audio_processor.stop()
+        # Only this screen's transcription stops: the model is shared (e.g. with push-to-talk).
+        self.workers.cancel_node(self)
+        if (audio_model := getattr(self, "audio_model", None)) is not None:
+            from le_chat.agent.stt_model import stt_models
+            stt_models.release(audio_model, self)
+
+    @work(group="stt-live")
     async def run_transcriber(self) -> None:
-        # Continuously consume audio paths from the model queue and emit STTResponseUpdate messages.
-        await self.audio_model.transcribe()
+        # Consume chunks from the model queue on this loop and emit STTResponseUpdate messages.
+        await self.audio_model.transcribe(self)
 
     def compose(self):
         yield Throbber(id="throbber")
         with containers.Vertical(id="stt-layout"):
             yield NonSelectableLabel("Idle", id="recording-indicator")
+            yield NonSelectableLabel("", id="pipeline-stats")
             yield containers.VerticalScroll(id="stt-view", can_focus=True)
             yield Prompt(id="user-prompt")
 
@@ -71,11 +100,16 @@ class SttScreen(Screen):
             return
         event.stop()
         if not self._recording:
+            if getattr(self, "audio_model", None) is None:
+                self.notify("The model is still loading", title="STT")
+                return
             self._recording = True
+            self.audio_model.reset_stats()
             self.audio_processor.start()
             self._start_chunk_producer()
             self._set_recording_indicator(recording=True)
             self.run_transcriber()
+            self._start_stats_timer()
         else:
             self._recording = False
             # Stop processor but flush the partial buffer so remaining audio becomes a final chunk.
@@ -85,17 +119,74 @@ class SttScreen(Screen):
     def _start_chunk_producer(self) -> None:
         self._produce_chunks()
 
-    @work(thread=True)
+    @work(group="stt-live")
     async def _produce_chunks(self) -> None:
-        for chunk_path in self.audio_processor.chunk_and_save_wav(output_path="output.wav"):
-            print(chunk_path)
-            await self.audio_model.insert_audio(str(chunk_path))
+        # The recorder wakes this loop when a chunk is ready; samples go straight to the model.
+        async for chunk in self.audio_processor.achunks():
+            await self.audio_model.insert_samples(chunk.samples, captured_at=chunk.t1)
         await self.audio_model.finish()
 
+    def _start_stats_timer(self) -> None:
+        if self._stats_timer is None:
+            self._stats_timer = self.set_interval(0.5, self._refresh_pipeline_stats)
+
+    def _refresh_pipeline_stats(self) -> None:
+        """Render live capture and transcription counters under the indicator."""
+        capture = self.audio_processor.stats()
+        parts = [
+            f"frames {capture.frames_captured} (dropped {capture.frames_dropped}, overflows {capture.input_overflows})",
+            f"frame q {capture.frames_queue_depth}/{capture.frames_queue_capacity}",
+            f"chunk q {capture.chunks_queue_depth}/{capture.chunks_queue_capacity}",
+            f"chunk wait {capture.chunk_wait.mean * 1000:.0f}ms (max {capture.chunk_wait.max * 1000:.0f})",
+        ]
+        if (audio_model := getattr(self, "audio_model", None)) is not None:
+            model = audio_model.stats()
+            parts += [
+                f"stt q {model.queue_depth}/{model.queue_capacity}",
+                f"stt wait {model.queue_wait.mean:.2f}s",
+                f"features {model.feature_sec.mean * 1000:.0f}ms / decode {model.decode_sec.mean * 1000:.0f}ms",
+                f"lag {model.transcription_lag.last:.2f}s (max {model.transcription_lag.max:.2f})",
+                f"cache {model.cache_hits}/{model.cache_hits + model.cache_misses} hits",
+            ]
+            idle = not self._recording and model.queue_depth == 0 and not audio_model._is_generating
+        else:
+            idle = not self._recording
+        self.query_one("#pipeline-stats", NonSelectableLabel).update(" · ".join(parts))
+        if idle and self._stats_timer is not None:
+            self._stats_timer.stop()
+            self._stats_timer = None
+
     def _set_recording_indicator(self, recording: bool) -> None:
         indicator = self.query_one("#recording-indicator", NonSelectableLabel)
-        indicator.update("Recording..." if recording else "Idle")
+        status = ["Recording..." if recording else "Idle"]
+        if self.audio_processor.rtf is not None:
+            status.append(f"chunk {self.audio_processor.chunk_sec:.1f}s")
+            status.append(f"RTF {self.audio_processor.rtf:.2f}")
+        dropped = self.audio_processor.dropped_chunks
+        if (audio_model := getattr(self, "audio_model", None)) is not None:
+            dropped += audio_model.dropped_chunks
+        if dropped:
+            status.append(f"dropped {dropped} chunk{'s' if dropped != 1 else ''}")
+        indicator.update(" · ".join(status))
         indicator.set_class(recording, "-recording")
+        indicator.set_class(dropped > 0, "-dropping")
+
+    @on(STTBatchProgress)
+    def on_batch_progress(self, event: STTBatchProgress) -> None:
+        """Show per-file progress while dropped files are transcribed."""
+        indicator = self.query_one("#recording-indicator", NonSelectableLabel)
+        status = "failed" if event.failed else f"{event.elapsed_sec:.1f}s"
+        text = f"Transcribed {event.done}/{event.total} · {Path(event.path).name} ({status})"
+        if (audio_model := getattr(self, "audio_model", None)) is not None:
+            cache = audio_model.cache
+            text += f" · cache {cache.hits} hit{'s' if cache.hits != 1 else ''}, {cache.misses} miss{'es' if cache.misses != 1 else ''}"
+        indicator.update(text if event.done < event.total else f"{text} · Done")
+
+    @on(STTChunkTranscribed)
+    def on_chunk_transcribed(self, event: STTChunkTranscribed) -> None:
+        """Adapt the recorder's chunk length to the measured real-time factor."""
+        self.audio_processor.report_rtf(event.rtf)
+        self._set_recording_indicator(recording=self._recording)
 
     @on(STTModelReady)
     async def on_model_ready(self, event: STTModelReady) -> None:
@@ -149,14 +240,25 @@ class SttScreen(Screen):
     @on(UserInputSubmitted)
     async def on_user_input_submitted(self, message: UserInputSubmitted) -> None:
         """Handle user input submission."""
-        success, msg = validate_input_files(message.body, allowed_types={"audio"})
+        self.query_one("#user-prompt", Prompt).clear()
+        self.submit_files(message.body)
+
+    @work(group="submit")
+    async def submit_files(self, body: str) -> None:
+        """Check the referenced files off the event loop, then transcribe them."""
         prompt_widget: Prompt = self.query_one("#user-prompt")
+        success, msg = await validate_input_files_async(
+            body,
+            allowed_types={"audio"},
+            on_progress=prompt_widget.show_attachment_progress,
+        )
         if not success:
+            if not prompt_widget.text:
+                # Give the prompt back so it can be fixed.
+                prompt_widget.text = body
             prompt_widget.warning_message = msg
             return
-        else:
-            prompt_widget.clear()
-        user_input = UserInput(message.body)
+        user_input = UserInput(body)
         stt_view = self.query_one("#stt-view", containers.VerticalScroll)
         await stt_view.mount(user_input)
         user_input.anchor()
@@ -166,9 +268,9 @@ class SttScreen(Screen):
         response.anchor()
         # Return focus to stt-view so spacebar recording works
         stt_view.focus()
-        self.send_files_to_model(message.body)
+        self.send_files_to_model(body)
     
     @work(thread=True)
     async def send_files_to_model(self, prompt: str) -> None:
         """Send user-provided audio files to the STT model for transcription."""
-        await self.audio_model.submit_prompt(prompt)
\ No newline at end of file
+        await self.audio_model.submit_prompt(prompt, self)
\ No newline at end of file
@@ -0,0 +1,390 @@
+"""Spoken output for streamed chat responses.
+
+Text arrives token by token; `SentenceSplitter` cuts it into sentences as soon
+as each one ends, a worker thread synthesizes them in order with an mlx-audio
+TTS model, and an `AudioSink` plays them back to back. Sentence N is being
+spoken while sentence N+1 is synthesized and later text is still generating.
+
+    python -m le_chat.speech --text "Hello there. How are you?" --wav out.wav
+"""
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+import queue
+import re
+import threading
+import time
+import wave
+
+import numpy as np
+from textual.message import Message
+from textual.message_pump import MessagePump
+
+RE_SENTENCE_END = re.compile(r"(?<=[.!?…:;])[\"')\]]*\s+|\n\s*\n")
+RE_MARKDOWN = re.compile(r"[*_#`>|]+|\[([^\]]*)\]\([^)]*\)")
+
+
+@dataclass
+class SpeechFirstAudio(Message):
+    """The first sentence of a response reached the sink."""
+    latency_sec: float
+
+
+class SentenceSplitter:
+    """Turns a stream of text fragments into speakable sentences.
+
+    Markdown markup is stripped and fenced code blocks are skipped. Sentences
+    shorter than `min_chars` are merged with the next so the TTS model is not
+    called for every "Yes." or list bullet.
+    """
+
+    def __init__(self, min_chars: int = 24) -> None:
+        self.min_chars = min_chars
+        self._pending = ""
+        self._short = ""
+        self._in_code = False
+
+    def _clean(self, text: str) -> str:
+        return " ".join(RE_MARKDOWN.sub(r"\1", text).split())
+
+    def _emit(self, sentence: str) -> list[str]:
+        sentence = self._clean(f"{self._short} {sentence}")
+        if len(sentence) < self.min_chars:
+            self._short = sentence
+            return []
+        self._short = ""
+        return [sentence]
+
+    def feed(self, text: str) -> list[str]:
+        """Add a fragment; returns the sentences it completed."""
+        self._pending += text
+        sentences = []
+        while True:
+            if self._in_code:
+                end = self._pending.find("```")
+                if end < 0:
+                    return sentences
+                self._pending = self._pending[end + 3:]
+                self._in_code = False
+                continue
+            fence = self._pending.find("```")
+            match = RE_SENTENCE_END.search(self._pending)
+            if fence >= 0 and (match is None or fence < match.start()):
+                sentences += self._emit(self._pending[:fence])
+                self._pending = self._pending[fence + 3:]
+                self._in_code = True
+                continue
+            if match is None:
+                return sentences
+            sentences += self._emit(self._pending[:match.end()])
+            self._pending = self._pending[match.end():]
+
+    def flush(self) -> list[str]:
+        """Whatever is left once the response is complete."""
+        rest = "" if self._in_code else self._pending
+        self._pending = ""
+        self._in_code = False
+        sentence = self._clean(f"{self._short} {rest}")
+        self._short = ""
+        return [sentence] if sentence else []
+
+
+class AudioSink(ABC):
+    """Where synthesized audio goes."""
+
+    underruns: int = 0
+
+    @abstractmethod
+    def start(self, sample_rate: int) -> None:
+        """Prepare for mono float32 audio at `sample_rate`."""
+
+    @abstractmethod
+    def write(self, samples: np.ndarray) -> None:
+        """Append samples; must not block for long."""
+
+    @abstractmethod
+    def close(self, drain: bool = True) -> None:
+        """Finish playback (`drain`) or drop whatever is still buffered."""
+
+    def interrupt(self) -> None:
+        """Silence buffered audio right away; may be called from any thread."""
+
+
+class SoundDeviceSink(AudioSink):
+    """Gapless playback through one sounddevice output stream.
+
+    Sentences are appended to a buffer the stream's callback reads from, so
+    consecutive sentences play without reopening the device. Playback starts
+    once `prebuffer_sec` of audio is queued, which absorbs jitter between
+    sentences; running dry before `close()` is counted in `underruns` and
+    played as silence.
+    """
+
+    def __init__(self, device: int | str | None = None, prebuffer_sec: float = 0.2, block_samples: int = 1024) -> None:
+        self.device = device
+        self.prebuffer_sec = prebuffer_sec
+        self.block_samples = block_samples
+        self.underruns = 0
+        self._buffer: deque[np.ndarray] = deque()
+        self._buffered = 0
+        self._lock = threading.Lock()
+        self._drained = threading.Event()
+        self._starved = False
+        self._closing = False
+        self._stream = None
+        self._sample_rate = 0
+
+    def start(self, sample_rate: int) -> None:
+        self._sample_rate = sample_rate
+        self._closing = False
+        self._drained.set()
+
+    def _callback(self, outdata, frames, time_info, status) -> None:
+        outdata.fill(0)
+        filled = 0
+        with self._lock:
+            while filled < frames and self._buffer:
+                head = self._buffer[0]
+                n = min(frames - filled, head.shape[0])
+                outdata[filled:filled + n, 0] = head[:n]
+                filled += n
+                if n == head.shape[0]:
+                    self._buffer.popleft()
+                else:
+                    self._buffer[0] = head[n:]
+            self._buffered -= filled
+            if filled < frames:
+                if not self._closing and not self._starved:
+                    self.underruns += 1
+                self._starved = True
+                self._drained.set()
+
+    def _open_stream(self) -> None:
+        # Imported lazily so headless machines without PortAudio can use WavSink.
+        import sounddevice as sd
+
+        self._stream = sd.OutputStream(
+            samplerate=self._sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.block_samples,
+            device=self.device,
+            callback=self._callback,
+        )
+        self._stream.start()
+
+    def write(self, samples: np.ndarray) -> None:
+        with self._lock:
+            self._buffer.append(samples.astype(np.float32, copy=False))
+            self._buffered += samples.shape[0]
+            self._starved = False
+            self._drained.clear()
+            buffered = self._buffered
+        if self._stream is None and buffered >= self.prebuffer_sec * self._sample_rate:
+            self._open_stream()
+
+    def interrupt(self) -> None:
+        with self._lock:
+            self._buffer.clear()
+            self._buffered = 0
+            self._drained.set()
+
+    def close(self, drain: bool = True) -> None:
+        self._closing = True
+        if drain and self._buffered:
+            if self._stream is None:
+                # Shorter than the prebuffer: play what there is.
+                self._open_stream()
+            self._drained.wait()
+        with self._lock:
+            self._buffer.clear()
+            self._buffered = 0
+        if self._stream is not None:
+            try:
+                self._stream.stop()
+            finally:
+                self._stream.close()
+            self._stream = None
+
+
+class WavSink(AudioSink):
+    """Writes the spoken response to a 16-bit WAV file, for headless runs."""
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._wav: wave.Wave_write | None = None
+
+    def start(self, sample_rate: int) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._wav = wave.open(str(self.path), "wb")
+        self._wav.setnchannels(1)
+        self._wav.setsampwidth(2)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, samples: np.ndarray) -> None:
+        pcm16 = (np.clip(samples, -1.0, 1.0) * 32767.0).astype(np.int16)
+        self._wav.writeframes(pcm16.tobytes())
+
+    def close(self, drain: bool = True) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+
+@dataclass
+class SpeechStats:
+    sentences: int = 0
+    first_audio_sec: float | None = None
+    """From `begin()` to the first samples reaching the sink."""
+    audio_sec: float = 0.0
+    synth_sec: float = 0.0
+    underruns: int = 0
+
+
+class SpeechPipeline:
+    """Speaks a streamed response sentence by sentence.
+
+    Call `begin()` when a response starts, `feed()` with each text fragment,
+    and `finish()` (or `cancel()`) when it ends. Synthesis runs on one worker
+    thread that lives for the whole session.
+
+    Args:
+        model_name: mlx-audio TTS model.
+        sink: Defaults to the sound card.
+        generate_kwargs: Extra arguments for the model's `generate` (voice, speed, ...).
+    """
+
+    def __init__(
+        self,
+        model_name: str = "mlx-community/Kokoro-82M-bf16",
+        sink: AudioSink | None = None,
+        generate_kwargs: dict | None = None,
+    ) -> None:
+        self.model_name = model_name
+        self.sink = sink if sink is not None else SoundDeviceSink()
+        self.generate_kwargs = generate_kwargs if generate_kwargs is not None else {"voice": "af_heart"}
+        self.model = None
+        self.stats = SpeechStats()
+        self._message_target: MessagePump | None = None
+        self._splitter = SentenceSplitter()
+        # Items are tagged with the response they belong to; bumping
+        # `_generation` invalidates everything queued or playing before it.
+        self._sentences: queue.Queue[tuple[int, str | threading.Event | None]] = queue.Queue()
+        self._generation = 0
+        self._started_at = 0.0
+        self._sink_open = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def post_message(self, message: Message) -> bool:
+        if (message_target := self._message_target) is None:
+            return False
+        return message_target.post_message(message)
+
+    def load(self) -> None:
+        """Load the TTS model now rather than on the first sentence."""
+        if self.model is None:
+            from mlx_audio.tts.utils import load_model  # Lazy import
+
+            self.model = load_model(self.model_name)
+
+    def begin(self, message_target: MessagePump | None = None) -> None:
+        self._message_target = message_target
+        self._splitter = SentenceSplitter()
+        self.stats = SpeechStats()
+        self._started_at = time.perf_counter()
+
+    def feed(self, text: str) -> None:
+        for sentence in self._splitter.feed(text):
+            self._sentences.put((self._generation, sentence))
+
+    def finish(self) -> None:
+        for sentence in self._splitter.flush():
+            self._sentences.put((self._generation, sentence))
+        self._sentences.put((self._generation, None))
+
+    def cancel(self) -> None:
+        """Stop speaking now; sentences not yet played are dropped."""
+        # Tagged with the old generation, so the worker closes without draining.
+        self._sentences.put((self._generation, None))
+        self._generation += 1
+        self._splitter = SentenceSplitter()
+        self.sink.interrupt()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """Block until everything fed so far has been spoken."""
+        done = threading.Event()
+        self._sentences.put((self._generation, done))
+        return done.wait(timeout)
+
+    def _speak(self, generation: int, sentence: str) -> None:
+        self.load()
+        started = time.perf_counter()
+        for result in self.model.generate(text=sentence, verbose=False, **self.generate_kwargs):
+            if generation != self._generation:
+                return
+            samples = np.asarray(result.audio, dtype=np.float32).reshape(-1)
+            if not self._sink_open:
+                self.sink.start(result.sample_rate)
+                self._sink_open = True
+            self.sink.write(samples)
+            self.stats.audio_sec += samples.shape[0] / result.sample_rate
+            if self.stats.first_audio_sec is None:
+                self.stats.first_audio_sec = time.perf_counter() - self._started_at
+                self.post_message(SpeechFirstAudio(self.stats.first_audio_sec))
+        self.stats.synth_sec += time.perf_counter() - started
+        self.stats.sentences += 1
+
+    def _close_sink(self, drain: bool) -> None:
+        if self._sink_open:
+            self.sink.close(drain=drain)
+            self.stats.underruns = self.sink.underruns
+            self._sink_open = False
+
+    def _run(self) -> None:
+        while True:
+            generation, item = self._sentences.get()
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            if item is None:
+                self._close_sink(drain=generation == self._generation)
+                continue
+            if generation != self._generation:
+                continue
+            try:
+                self._speak(generation, item)
+            except Exception:
+                import traceback
+                print(traceback.format_exc())
+
+
+def main() -> None:
+    import argparse
+    from dataclasses import asdict
+    import json
+
+    parser = argparse.ArgumentParser(description="Speak text the way a streamed chat response is spoken.")
+    parser.add_argument("--text", required=True)
+    parser.add_argument("--model", default="mlx-community/Kokoro-82M-bf16")
+    parser.add_argument("--wav", type=Path, help="Write to this WAV file instead of the sound card")
+    parser.add_argument("--tokens-per-sec", type=float, default=30.0, help="Simulated generation speed")
+    args = parser.parse_args()
+
+    speech = SpeechPipeline(args.model, sink=WavSink(args.wav) if args.wav else None)
+    load_started = time.perf_counter()
+    speech.load()
+    load_sec = time.perf_counter() - load_started
+
+    speech.begin()
+    for word in re.findall(r"\S+\s*", args.text):
+        speech.feed(word)
+        time.sleep(1 / args.tokens_per_sec)
+    speech.finish()
+    speech.wait()
+    print(json.dumps({"model": args.model, "load_sec": load_sec, **asdict(speech.stats)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Decode audio files to mono float32 at a fixed sample rate."""
+from dataclasses import dataclass
+import hashlib
+import mmap
+import os
+from pathlib import Path
+import shutil
+import struct
+import subprocess
+import threading
+from typing import Iterator
+
+import numpy as np
+
+from le_chat.utils.cache import cache_dir, evict_lru, touch
+
+SAMPLE_RATE = 16000
+NORMALIZED_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+"""Budget for each kind of normalized entry (`.npy` and `.wav`) under the audio cache."""
+
+
+class AudioDecodeError(Exception):
+    """The audio file could not be decoded."""
+
+
+def resample(samples: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """Polyphase resampling of a 1-D signal."""
+    if orig_sr == target_sr:
+        return samples
+    from scipy import signal  # Lazy import
+
+    gcd = np.gcd(orig_sr, target_sr)
+    return signal.resample_poly(samples, target_sr // gcd, orig_sr // gcd).astype(np.float32)
+
+
+def _decode_ffmpeg(path: Path, sr: int) -> np.ndarray:
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise AudioDecodeError(f"Cannot decode {path.name!r}: unsupported by soundfile and ffmpeg is not installed.")
+    process = subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-i", str(path), "-f", "f32le", "-ac", "1", "-ar", str(sr), "-"],
+        capture_output=True,
+    )
+    if process.returncode != 0:
+        raise AudioDecodeError(f"ffmpeg failed to decode {path.name!r}: {process.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(process.stdout, dtype=np.float32)
+
+
+def decode_audio(path: str | Path, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file to a mono float32 waveform at `sr` Hz.
+
+    Uses soundfile (WAV, FLAC, OGG, MP3) and falls back to ffmpeg for
+    containers libsndfile cannot read, such as M4A voice memos.
+
+    Raises:
+        AudioDecodeError: If neither decoder can read the file.
+    """
+    import soundfile as sf  # Lazy import
+
+    path = Path(path)
+    if not path.is_file():
+        raise AudioDecodeError(f"File not found {str(path)!r}")
+    try:
+        audio, file_sr = sf.read(str(path), dtype="float32", always_2d=True)
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return _decode_ffmpeg(path, sr)
+    return resample(audio.mean(axis=1), file_sr, sr)
+
+
+def _normalized_entry(path: Path, sr: int, suffix: str) -> Path:
+    stat = path.stat()
+    key = hashlib.sha256(f"{path}\0{stat.st_mtime_ns}\0{stat.st_size}\0{sr}".encode()).hexdigest()
+    return cache_dir("audio") / f"{key}{suffix}"
+
+
+def _publish(target: Path, write) -> None:
+    """Write a cache entry under a temporary name and atomically move it into place."""
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    evict_lru(target.parent, NORMALIZED_CACHE_BYTES, pattern=f"*{target.suffix}")
+
+
+def normalized_audio_path(path: str | Path, sr: int = SAMPLE_RATE) -> Path:
+    """Decode a file once to mono float32 at `sr` and return the cached `.npy`.
+
+    Entries are keyed by resolved path, mtime and size, so an edited file is
+    decoded again while repeated uses of the same file only touch the cache.
+    """
+    path = Path(path).resolve()
+    target = _normalized_entry(path, sr, ".npy")
+    if target.exists():
+        touch(target)
+        return target
+    samples = decode_audio(path, sr)
+
+    def write(tmp: Path) -> None:
+        with tmp.open("wb") as f:
+            np.save(f, samples)
+
+    _publish(target, write)
+    return target
+
+
+def load_normalized(path: str | Path, sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Memory-mapped mono float32 samples of `path` at `sr`, decoding it at most once."""
+    return np.load(normalized_audio_path(path, sr), mmap_mode="r")
+
+
+def normalized_wav_path(path: str | Path, sr: int = SAMPLE_RATE) -> Path:
+    """Like `normalized_audio_path`, but as a float32 WAV for libraries that only take file paths.
+
+    Reading it back is a straight copy: no codec and, at the consumer's own
+    sample rate, no resampling.
+    """
+    import soundfile as sf  # Lazy import
+
+    path = Path(path).resolve()
+    target = _normalized_entry(path, sr, ".wav")
+    if target.exists():
+        touch(target)
+        return target
+    samples = load_normalized(path, sr)
+    _publish(target, lambda tmp: sf.write(str(tmp), samples, sr, subtype="FLOAT", format="WAV"))
+    return target
+
+
+@dataclass
+class WavLayout:
+    """Where the samples of an uncompressed WAV file live on disk."""
+    offset: int
+    frames: int
+    channels: int
+    sample_rate: int
+    dtype: np.dtype
+
+
+def _wav_layout(path: Path) -> WavLayout | None:
+    """Parse the RIFF header of a PCM or IEEE-float WAV; None for anything else."""
+    with path.open("rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while chunk := f.read(8):
+            if len(chunk) < 8:
+                return None
+            chunk_id, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(size)
+                if size % 2:
+                    f.read(1)
+            elif chunk_id == b"data":
+                if fmt is None or len(fmt) < 16:
+                    return None
+                audio_format, channels, sample_rate = struct.unpack("<HHI", fmt[:8])
+                bits = struct.unpack("<H", fmt[14:16])[0]
+                if audio_format == 0xFFFE and len(fmt) >= 26:
+                    audio_format = struct.unpack("<H", fmt[24:26])[0]  # WAVE_FORMAT_EXTENSIBLE sub-format
+                dtype = {(1, 16): "<i2", (1, 32): "<i4", (3, 32): "<f4", (3, 64): "<f8"}.get((audio_format, bits))
+                if dtype is None:
+                    return None
+                dtype = np.dtype(dtype)
+                # Streamed WAVs may carry a placeholder size; trust the file length instead.
+                size = min(size, path.stat().st_size - f.tell())
+                frames = size // (dtype.itemsize * channels)
+                return WavLayout(f.tell(), frames, channels, sample_rate, dtype)
+            else:
+                f.seek(size + size % 2, 1)
+    return None
+
+
+def _to_float(block: np.ndarray) -> np.ndarray:
+    """Mono float32 from an (n, channels) block of any supported sample type."""
+    if block.dtype.kind == "i":
+        scale = float(2 ** (8 * block.dtype.itemsize - 1))
+        block = block.astype(np.float32) / scale
+    return block.mean(axis=1, dtype=np.float32)
+
+
+class StreamResampler:
+    """Resamples a signal fed block by block, with the same output as resampling it whole.
+
+    Each block is resampled together with enough input on either side to
+    cover the filter, and only outputs whose filter window is complete are
+    returned; the rest wait for the next block (or `flush`). Resampling
+    blocks independently would put edge transients (clicks) at every
+    boundary.
+    """
+
+    def __init__(self, orig_sr: int, target_sr: int) -> None:
+        gcd = int(np.gcd(orig_sr, target_sr))
+        self.up, self.down = target_sr // gcd, orig_sr // gcd
+        self.orig_sr, self.target_sr = orig_sr, target_sr
+        # resample_poly's filter reaches 10 * max(up, down) upsampled samples each way;
+        # as input context, rounded up to whole multiples of `down` so outputs stay aligned.
+        reach = 10 * max(self.up, self.down) // self.up + 2
+        self.context = -(-reach // self.down) * self.down
+        self._pending = np.empty((0,), dtype=np.float32)
+        self._start = 0
+        """Input index of `_pending[0]`; always a multiple of `down`."""
+        self._emitted = 0
+        """Output samples returned so far."""
+
+    def _take(self, end: int) -> np.ndarray:
+        """Outputs up to (not including) index `end`, from the pending input."""
+        first = self._start * self.up // self.down
+        out = resample(self._pending, self.orig_sr, self.target_sr)[self._emitted - first:end - first]
+        self._emitted = end
+        return out
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        if self.orig_sr == self.target_sr:
+            return block
+        self._pending = np.concatenate([self._pending, block])
+        available = self._start + self._pending.shape[0]
+        end = max(self._emitted, (available - self.context) * self.up // self.down)
+        if end == self._emitted:
+            return np.empty((0,), dtype=np.float32)
+        out = self._take(end)
+        # Keep `context` input samples before the next output to come.
+        keep_from = max(self._start, (end * self.down // self.up - self.context) // self.down * self.down)
+        self._pending = self._pending[keep_from - self._start:]
+        self._start = keep_from
+        return out
+
+    def flush(self) -> np.ndarray:
+        if self.orig_sr == self.target_sr or not self._pending.shape[0]:
+            return np.empty((0,), dtype=np.float32)
+        total = self._start + self._pending.shape[0]
+        out = self._take(-(-total * self.up // self.down))
+        self._pending = np.empty((0,), dtype=np.float32)
+        return out
+
+
+def _iter_wav_mmap(path: Path, layout: WavLayout, sr: int, block_sec: float) -> Iterator[np.ndarray]:
+    """Read a raw WAV through a memory map, releasing pages once they are consumed."""
+    frame_bytes = layout.dtype.itemsize * layout.channels
+    step = max(1, int(layout.sample_rate * block_sec))
+    resampler = StreamResampler(layout.sample_rate, sr)
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        released = 0
+        for start in range(0, layout.frames, step):
+            count = min(step, layout.frames - start)
+            block = np.frombuffer(
+                mm, dtype=layout.dtype, count=count * layout.channels, offset=layout.offset + start * frame_bytes
+            ).reshape(count, layout.channels)
+            out = resampler.push(_to_float(block))
+            del block
+            # Drop pages we are done with so resident memory stays flat on long files.
+            consumed = (layout.offset + (start + count) * frame_bytes) // mmap.PAGESIZE * mmap.PAGESIZE
+            if hasattr(mmap, "MADV_DONTNEED") and consumed > released:
+                mm.madvise(mmap.MADV_DONTNEED, released, consumed - released)
+                released = consumed
+            if out.shape[0]:
+                yield out
+    if (out := resampler.flush()).shape[0]:
+        yield out
+
+
+def _iter_blocks(path: Path, sr: int, block_sec: float) -> Iterator[np.ndarray]:
+    """Yield consecutive mono float32 blocks at `sr` without loading the whole file."""
+    if (layout := _wav_layout(path)) is not None:
+        yield from _iter_wav_mmap(path, layout, sr, block_sec)
+        return
+
+    import soundfile as sf  # Lazy import
+
+    try:
+        info = sf.info(str(path))
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        info = None
+    if info is not None:
+        step = max(1, int(info.samplerate * block_sec))
+        resampler = StreamResampler(info.samplerate, sr)
+        for block in sf.blocks(str(path), blocksize=step, dtype="float32", always_2d=True):
+            if (out := resampler.push(block.mean(axis=1))).shape[0]:
+                yield out
+        if (out := resampler.flush()).shape[0]:
+            yield out
+        return
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise AudioDecodeError(f"Cannot decode {path.name!r}: unsupported by soundfile and ffmpeg is not installed.")
+    process = subprocess.Popen(
+        [ffmpeg, "-nostdin", "-v", "error", "-i", str(path), "-f", "f32le", "-ac", "1", "-ar", str(sr), "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        step_bytes = max(1, int(sr * block_sec)) * 4
+        while raw := process.stdout.read(step_bytes):
+            yield np.frombuffer(raw[: len(raw) - len(raw) % 4], dtype=np.float32)
+    finally:
+        process.kill()
+        process.wait()
+
+
+def audio_duration(path: str | Path) -> float | None:
+    """Duration in seconds from the file header, or None if it cannot be read cheaply."""
+    path = Path(path)
+    if (layout := _wav_layout(path)) is not None:
+        return layout.frames / layout.sample_rate
+    import soundfile as sf  # Lazy import
+
+    try:
+        return sf.info(str(path)).duration
+    except (sf.LibsndfileError, RuntimeError, TypeError):
+        return None
+
+
+def iter_audio_windows(
+    path: str | Path,
+    window_sec: float = 30.0,
+    sr: int = SAMPLE_RATE,
+    search_sec: float = 2.0,
+) -> Iterator[tuple[float, np.ndarray]]:
+    """Stream a file as consecutive windows of at most `window_sec` seconds.
+
+    Each window ends at the quietest 20 ms within the last `search_sec`
+    seconds, so cuts tend to fall between words. Memory is bounded by a
+    couple of windows regardless of the file's length.
+
+    Yields:
+        (start time in seconds, mono float32 samples at `sr`).
+    """
+    path = Path(path)
+    if not path.is_file():
+        raise AudioDecodeError(f"File not found {str(path)!r}")
+    window = int(window_sec * sr)
+    search = min(int(search_sec * sr), window // 2)
+    frame = max(1, sr // 50)
+    buf = np.empty((0,), dtype=np.float32)
+    offset = 0
+    for block in _iter_blocks(path, sr, block_sec=min(window_sec, 5.0)):
+        buf = np.concatenate([buf, block])
+        while buf.shape[0] >= window:
+            tail = buf[window - search:window]
+            n_frames = tail.shape[0] // frame
+            energy = np.square(tail[: n_frames * frame]).reshape(n_frames, frame).mean(axis=1)
+            cut = window - search + int(np.argmin(energy)) * frame if n_frames else window
+            yield offset / sr, buf[:cut]
+            offset += cut
+            buf = buf[cut:].copy()
+    if buf.shape[0]:
+        yield offset / sr, buf
@@ -0,0 +1,73 @@
+"""On-disk cache locations and size-capped eviction shared by le-chat's caches."""
+import hashlib
+import os
+from pathlib import Path
+import threading
+
+_content_hashes: dict[tuple[Path, int, int], str] = {}
+_content_hash_lock = threading.Lock()
+
+
+def cache_dir(*parts: str) -> Path:
+    """Return (and create) a directory under the user cache, e.g. ~/.cache/le_chat/<parts>."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    root = Path(os.environ.get("LE_CHAT_CACHE_DIR") or Path(base) / "le_chat")
+    path = root.joinpath(*parts)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def hash_file(path: str | Path) -> str:
+    """SHA-256 hex digest of a file's contents, read in blocks."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def content_hash(path: Path) -> str:
+    """`hash_file`, remembered per (path, mtime, size) so a file is hashed once per process."""
+    stat = path.stat()
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _content_hash_lock:
+        if (digest := _content_hashes.get(key)) is not None:
+            return digest
+    digest = hash_file(path)
+    with _content_hash_lock:
+        _content_hashes[key] = digest
+    return digest
+
+
+def touch(path: Path) -> None:
+    """Mark a cache entry as recently used (eviction is least-recently-used by mtime)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_lru(directory: Path, max_bytes: int, pattern: str = "*") -> int:
+    """Delete least-recently-used files in `directory` until it fits in `max_bytes`.
+
+    Returns:
+        Number of files removed.
+    """
+    entries = []
+    total = 0
+    for entry in directory.glob(pattern):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        if entry.is_file():
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+    removed = 0
+    for _, size, entry in sorted(entries, key=lambda e: e[0]):
+        if total <= max_bytes:
+            break
+        try:
+            entry.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,82 @@
+"""Downscale images once before they reach a vision model."""
+import hashlib
+import io
+import os
+from pathlib import Path
+import threading
+
+from le_chat.utils.cache import cache_dir, content_hash, evict_lru, touch
+
+IMAGE_CACHE_BYTES = 512 * 1024 * 1024
+PIXELS_PER_TOKEN = 28 * 28
+"""One vision token per 28x28 pixels (14 px patches merged 2x2), the common case for current VLMs."""
+
+
+def target_size(width: int, height: int, max_side: int | None = None, max_pixels: int | None = None) -> tuple[int, int]:
+    """Largest size with the same aspect ratio within `max_side` and `max_pixels`; never upscales."""
+    scale = 1.0
+    if max_side:
+        scale = min(scale, max_side / max(width, height))
+    if max_pixels:
+        scale = min(scale, (max_pixels / (width * height)) ** 0.5)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def normalized_image_path(
+    path: str | Path,
+    max_side: int | None = None,
+    max_pixels: int | None = None,
+    quality: int = 90,
+) -> Path:
+    """Decode an image once, orient and downscale it, and return the cached file.
+
+    The cached copy is keyed by the file's content hash and the parameters,
+    so the same photo attached twice, or kept in history across turns, is
+    only decoded and resized the first time. Opaque images are stored as
+    JPEG and images with transparency as PNG. Images that already fit and
+    need no rotation are returned as they are.
+
+    Args:
+        path: Image file.
+        max_side: Longest side in pixels, e.g. the model's native resolution.
+        max_pixels: Pixel budget, e.g. `token_budget * PIXELS_PER_TOKEN`.
+        quality: JPEG quality of the cached copy.
+    """
+    from PIL import Image, ImageOps  # Lazy import
+
+    path = Path(path).resolve()
+    key = hashlib.sha256(f"{content_hash(path)}\0{max_side}\0{max_pixels}\0{quality}".encode()).hexdigest()
+    directory = cache_dir("images")
+    for suffix in (".jpg", ".png"):
+        if (target := directory / f"{key}{suffix}").exists():
+            touch(target)
+            return target
+
+    with Image.open(path) as image:
+        orientation = image.getexif().get(0x0112, 1)  # EXIF Orientation
+        size = target_size(image.width, image.height, max_side, max_pixels)
+        if size == image.size and orientation == 1 and image.format in ("JPEG", "PNG"):
+            return path
+        # Let the decoder downsample JPEGs while decoding (much cheaper for large photos).
+        image.draft("RGB", size)
+        image = ImageOps.exif_transpose(image)
+        size = target_size(image.width, image.height, max_side, max_pixels)
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        buffer = io.BytesIO()
+        if has_alpha:
+            target = directory / f"{key}.png"
+            image.save(buffer, format="PNG", optimize=True)
+        else:
+            target = directory / f"{key}.jpg"
+            image.convert("RGB").save(buffer, format="JPEG", quality=quality)
+
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        tmp.write_bytes(buffer.getvalue())
+        os.replace(tmp, target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    evict_lru(directory, IMAGE_CACHE_BYTES, pattern="*.[jp][pn]g")
+    return target
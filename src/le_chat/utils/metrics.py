@@ -0,0 +1,42 @@
+"""Lightweight counters and gauges for the live audio pipeline."""
+from dataclasses import dataclass
+import threading
+
+
+@dataclass
+class GaugeSnapshot:
+    last: float = 0.0
+    mean: float = 0.0
+    max: float = 0.0
+    count: int = 0
+
+
+class Gauge:
+    """Tracks the last, mean and max of a stream of observations.
+
+    Safe to update from one thread while another reads snapshots.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last = 0.0
+        self._total = 0.0
+        self._max = 0.0
+        self._count = 0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._last = value
+            self._total += value
+            self._max = max(self._max, value)
+            self._count += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._last = self._total = self._max = 0.0
+            self._count = 0
+
+    def snapshot(self) -> GaugeSnapshot:
+        with self._lock:
+            mean = self._total / self._count if self._count else 0.0
+            return GaugeSnapshot(last=self._last, mean=mean, max=self._max, count=self._count)
@@ -0,0 +1,163 @@
+"""Fit large text attachments into a token budget."""
+from collections import Counter
+from dataclasses import dataclass
+import math
+import re
+from typing import Callable, Iterable, List
+
+RE_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+STOP_WORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "her", "was", "one", "our",
+    "out", "has", "have", "this", "that", "with", "what", "when", "where", "which", "who", "why",
+    "how", "from", "they", "will", "would", "there", "their", "about", "into", "file", "please",
+    "explain", "tell", "show", "does", "here",
+}
+
+
+@dataclass
+class Chunk:
+    start_line: int
+    end_line: int
+    """Exclusive."""
+    text: str
+    tokens: int = 0
+    score: float = 0.0
+
+
+@dataclass
+class FittedText:
+    text: str
+    tokens: int
+    """Tokens of `text`, elision notes excluded."""
+    total_tokens: int
+    """Tokens of the whole attachment."""
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.total_tokens - self.tokens
+
+
+def query_terms(text: str) -> List[str]:
+    """Lower-cased words of a prompt worth matching against an attachment."""
+    return [w for w in (m.group(0).lower() for m in RE_WORD.finditer(text)) if w not in STOP_WORDS]
+
+
+def split_chunks(text: str, chunk_chars: int = 1500) -> List[Chunk]:
+    """Split text into runs of whole lines of about `chunk_chars` characters.
+
+    Lines longer than `chunk_chars` (minified code, single-line logs) are cut.
+    """
+    chunks: List[Chunk] = []
+    lines: List[str] = []
+    size = 0
+    start = 0
+    for number, line in enumerate(text.splitlines(keepends=True)):
+        while len(line) > chunk_chars:
+            if lines:
+                chunks.append(Chunk(start, number, "".join(lines)))
+                lines, size = [], 0
+            chunks.append(Chunk(number, number + 1, line[:chunk_chars]))
+            line = line[chunk_chars:]
+            start = number
+        if not lines:
+            start = number
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_chars:
+            chunks.append(Chunk(start, number + 1, "".join(lines)))
+            lines, size = [], 0
+    if lines:
+        chunks.append(Chunk(start, start + len(lines), "".join(lines)))
+    return chunks
+
+
+def _score(chunks: List[Chunk], terms: Iterable[str]) -> None:
+    """BM25-style relevance of each chunk to the query terms."""
+    terms = set(terms)
+    if not terms:
+        return
+    counts = [Counter(w.lower() for w in RE_WORD.findall(c.text)) for c in chunks]
+    n = len(chunks)
+    avg_len = sum(sum(c.values()) for c in counts) / n or 1
+    for term in terms:
+        df = sum(1 for c in counts if term in c)
+        if not df:
+            continue
+        idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+        for chunk, c in zip(chunks, counts):
+            if tf := c.get(term):
+                length = sum(c.values())
+                chunk.score += idf * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / avg_len))
+
+
+def fit_text(
+    text: str,
+    budget: int,
+    count_tokens: Callable[[str], int],
+    query: str = "",
+    head_fraction: float = 0.25,
+    tail_fraction: float = 0.25,
+) -> FittedText:
+    """Shorten `text` to about `budget` tokens, keeping what matters most.
+
+    The start and end of the text are kept (up to `head_fraction` and
+    `tail_fraction` of the budget), and the rest of the budget goes to the
+    chunks most relevant to `query`. Chunks are put back in file order and
+    every gap is replaced by a note saying which lines were left out.
+
+    Args:
+        text: Contents of the attachment.
+        budget: Maximum tokens to include.
+        count_tokens: Token counter, normally the model's tokenizer.
+        query: The user's prompt, used to rank chunks.
+
+    Returns:
+        The fitted text; unchanged if it already fits.
+    """
+    chunks = split_chunks(text)
+    for chunk in chunks:
+        chunk.tokens = count_tokens(chunk.text)
+    total = sum(c.tokens for c in chunks)
+    if total <= budget:
+        return FittedText(text, total, total)
+
+    keep: set[int] = set()
+    used = 0
+
+    def take(indices: Iterable[int], limit: int) -> None:
+        nonlocal used
+        for i in indices:
+            if i in keep:
+                continue
+            if used + chunks[i].tokens > limit:
+                break
+            keep.add(i)
+            used += chunks[i].tokens
+
+    take(range(len(chunks)), int(budget * head_fraction))
+    take(range(len(chunks) - 1, -1, -1), used + int(budget * tail_fraction))
+    _score(chunks, query_terms(query))
+    # Most relevant first; ties (e.g. no query) go to the earliest chunk.
+    for i in sorted(range(len(chunks)), key=lambda i: (-chunks[i].score, i)):
+        if i not in keep and used + chunks[i].tokens <= budget:
+            keep.add(i)
+            used += chunks[i].tokens
+
+    parts = []
+    gap: List[Chunk] = []
+    for i, chunk in enumerate(chunks):
+        if i in keep:
+            if gap:
+                parts.append(_elision(gap))
+                gap = []
+            parts.append(chunk.text)
+        else:
+            gap.append(chunk)
+    if gap:
+        parts.append(_elision(gap))
+    return FittedText("".join(parts), used, total)
+
+
+def _elision(gap: List[Chunk]) -> str:
+    tokens = sum(c.tokens for c in gap)
+    return f"\n[... lines {gap[0].start_line + 1}-{gap[-1].end_line} omitted ({tokens} tokens) ...]\n"
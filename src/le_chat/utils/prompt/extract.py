@@ -1,11 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import glob
+import os
 from pathlib import Path
 import re
-from typing import Iterable, Set
+from typing import Callable, Iterable, List, Set
 
-from le_chat.utils.prompt.resource import ResourceType, load_resource, ResourceUnsupportedType, ResourceReadError
+from le_chat.utils.prompt.resource import Resource, ResourceError, ResourceType, load_resource, ResourceUnsupportedType, ResourceReadError
 
 
 RE_MATCH_FILE_PROMPT = re.compile(r"@(\S+)|@\"(.*)\"")
+GLOB_CHARS = set("*?[")
+
+GLOB_MAX_FILES = 500
+GLOB_MAX_FILE_BYTES = 1024 * 1024
+GLOB_MAX_TOTAL_BYTES = 16 * 1024 * 1024
 
 
 def extract_paths_from_prompt(prompt: str) -> Iterable[tuple[str, int, int]]:
@@ -22,6 +32,141 @@ def extract_paths_from_prompt(prompt: str) -> Iterable[tuple[str, int, int]]:
         yield (path or quoted_path, match.start(0), match.end(0))
 
 
+def is_glob(path: str) -> bool:
+    """Whether an @ reference is a glob, rather than a path that contains `*`, `?` or `[`."""
+    return not GLOB_CHARS.isdisjoint(path) and not Path(path).exists()
+
+
+@dataclass
+class GlobExpansion:
+    """Text files a glob reference expands to."""
+    pattern: str
+    resources: List[Resource] = field(default_factory=list)
+    skipped: List[tuple[Path, str]] = field(default_factory=list)
+    """Matches left out, with the reason."""
+    total_bytes: int = 0
+
+    def preview(self, limit: int = 5) -> str:
+        """Short summary of what will be attached."""
+        names = ", ".join(str(r.path) for r in self.resources[:limit])
+        if len(self.resources) > limit:
+            names += f", ... (+{len(self.resources) - limit})"
+        summary = f"@{self.pattern}: {len(self.resources)} files, {self.total_bytes / 1024:.0f} KB"
+        if self.skipped:
+            summary += f", {len(self.skipped)} skipped"
+        return f"{summary}\n{names}" if names else summary
+
+
+def _open_text(path: Path, max_file_bytes: int) -> Resource | str:
+    """The text resource at `path`, or why it is skipped."""
+    try:
+        if path.stat().st_size > max_file_bytes:
+            return "too large"
+        resource = load_resource(path)
+    except ResourceUnsupportedType:
+        return "binary"
+    except (ResourceError, OSError) as error:
+        return str(error)
+    return resource if resource.resource_type == "text" else resource.resource_type
+
+
+def expand_glob(
+    pattern: str,
+    max_files: int = GLOB_MAX_FILES,
+    max_file_bytes: int = GLOB_MAX_FILE_BYTES,
+    max_total_bytes: int = GLOB_MAX_TOTAL_BYTES,
+) -> GlobExpansion:
+    """Expand a glob (`**` matches any depth) to the text files it matches.
+
+    Files are sniffed and then prefetched on a thread pool, so the OS can serve
+    many reads at once. Binary files and files over `max_file_bytes` are
+    skipped, and expansion stops at `max_files` files or `max_total_bytes` in
+    total; matches past that point are not sniffed at all. The resources go through the resource cache, so building the
+    prompt afterwards finds them there with their pages already in memory.
+    """
+    expansion = GlobExpansion(pattern)
+    paths = sorted(Path(p) for p in glob.iglob(os.path.expanduser(pattern), recursive=True))
+    paths = [p for p in paths if p.is_file()]
+    if not paths:
+        return expansion
+    workers = min(32, len(paths))
+    capped_at: int | None = None
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Sniff one batch per round, so at most one batch is read past the cap.
+        for start in range(0, len(paths), workers):
+            batch = paths[start:start + workers]
+            opened = pool.map(lambda p: _open_text(p, max_file_bytes), batch)
+            for index, (path, resource) in enumerate(zip(batch, opened), start):
+                if isinstance(resource, str):
+                    expansion.skipped.append((path, resource))
+                    continue
+                size = path.stat().st_size
+                if len(expansion.resources) >= max_files or expansion.total_bytes + size > max_total_bytes:
+                    capped_at = index
+                    break
+                expansion.resources.append(resource)
+                expansion.total_bytes += size
+            if capped_at is None and len(expansion.resources) >= max_files:
+                capped_at = start + len(batch)
+            if capped_at is not None:
+                expansion.skipped.extend((path, "over the attachment cap") for path in paths[capped_at:])
+                break
+        list(pool.map(Resource.prefetch, expansion.resources))
+    return expansion
+
+
+def _validate_path(path: str, allowed_types: Set[ResourceType], preload: bool = False) -> tuple[bool, str | None]:
+    """Check one @ reference.
+
+    Returns:
+        (True, a preview of what a glob expands to, or None) or (False, the error).
+    """
+    if is_glob(path):
+        if "text" not in allowed_types:
+            allowed_str = ", ".join(sorted(allowed_types))
+            return False, f"'{path}' expands to text files, but only {allowed_str} allowed."
+        expansion = expand_glob(path)
+        if not expansion.resources:
+            return False, f"'{path}' matches no text files."
+        return True, expansion.preview()
+    file_path = Path(path)
+    if file_path.is_dir():
+        if "text" not in allowed_types:
+            allowed_str = ", ".join(sorted(allowed_types))
+            return False, f"'{file_path.name}' is a directory, but only {allowed_str} allowed."
+        from le_chat.utils.prompt.index import directory_indexes  # Lazy import
+        directory_indexes.refresh(file_path)
+        return True, None
+    if not file_path.exists() or not file_path.is_file():
+        return False, f"{file_path} File not found."
+
+    try:
+        resource = load_resource(file_path)
+        if resource.resource_type not in allowed_types:
+            allowed_str = ", ".join(sorted(allowed_types))
+            return False, f"'{file_path.name}' is {resource.resource_type}, but only {allowed_str} allowed."
+        if preload:
+            # Warm the page cache now, off the caller's thread, so building the prompt reads from memory.
+            resource.prefetch()
+    except ResourceUnsupportedType as e:
+        return False, str(e)
+    except ResourceReadError as e:
+        return False, str(e)
+    return True, None
+
+
+def _summarize(results: Iterable[tuple[bool, str | None]]) -> tuple[bool, str]:
+    previews = []
+    for success, message in results:
+        if not success:
+            return False, message
+        if message:
+            previews.append(message)
+    if previews:
+        return True, "\n".join(previews)
+    return True, "All files valid."
+
+
 def validate_input_files(
     prompt: str,
     allowed_types: Set[ResourceType] | None = None
@@ -32,29 +177,63 @@ def validate_input_files(
         prompt: The user prompt potentially containing @file references.
         allowed_types: Set of allowed resource types (e.g., {"audio"}, {"audio", "text", "image"}).
                       If None, all types are allowed (text, image, audio).
+                      Directories count as text; referencing one starts
+                      (re)indexing it in the background.
     
     Returns:
-        A tuple of (success: bool, message: str).
+        A tuple of (success: bool, message: str). For prompts with glob
+        references the message previews what they expand to.
     """
     if allowed_types is None:
         allowed_types = {"text", "image", "audio"}
-    
+    results = []
     for path, _, _ in extract_paths_from_prompt(prompt):
-        file_path = Path(path)
-        if not file_path.exists() or not file_path.is_file():
-            return False, f"{file_path} File not found."
-        
-        try:
-            resource = load_resource(file_path)
-            if resource.resource_type not in allowed_types:
-                allowed_str = ", ".join(sorted(allowed_types))
-                return False, f"'{file_path.name}' is {resource.resource_type}, but only {allowed_str} allowed."
-        except ResourceUnsupportedType as e:
-            return False, str(e)
-        except ResourceReadError as e:
-            return False, str(e)
-    
-    return True, "All files valid."
+        results.append(result := _validate_path(path, allowed_types))
+        if not result[0]:
+            break
+    return _summarize(results)
+
+
+_attachment_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="attachments")
+
+
+async def validate_input_files_async(
+    prompt: str,
+    allowed_types: Set[ResourceType] | None = None,
+    on_progress: Callable[[int, int, str], None] | None = None,
+) -> tuple[bool, str]:
+    """`validate_input_files` for the event loop: every reference is checked
+    and loaded concurrently on a thread pool.
+
+    Attachments are also prefetched into the OS page cache, so the agent's
+    prompt build reads them from memory. They are not decoded here: decoding
+    holds the GIL and would stall the event loop this is meant to keep free.
+
+    Args:
+        on_progress: Called on the event loop as `(done, total, path)` after
+            each reference is checked.
+
+    Returns:
+        Same as `validate_input_files`; errors are reported for the first
+        failing reference in prompt order.
+    """
+    if allowed_types is None:
+        allowed_types = {"text", "image", "audio"}
+    paths = [path for path, _, _ in extract_paths_from_prompt(prompt)]
+    if not paths:
+        return True, "All files valid."
+    loop = asyncio.get_running_loop()
+    done = 0
+
+    async def check(path: str) -> tuple[bool, str | None]:
+        nonlocal done
+        result = await loop.run_in_executor(_attachment_executor, _validate_path, path, allowed_types, True)
+        done += 1
+        if on_progress is not None:
+            on_progress(done, len(paths), path)
+        return result
+
+    return _summarize(await asyncio.gather(*(check(path) for path in paths)))
 
 
 if __name__ == "__main__":
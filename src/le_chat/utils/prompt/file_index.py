@@ -0,0 +1,302 @@
+"""In-memory index of the working tree for fuzzy `@` path completion.
+
+The file list comes from `git ls-files` inside a git work tree (which applies
+every .gitignore rule git does), or from a directory walk that reads
+.gitignore files itself. It is built and refreshed on a background thread;
+a refresh of a walked tree only re-lists directories whose mtime changed.
+"""
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import re
+import shutil
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+ALWAYS_SKIP = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", ".mypy_cache", ".pytest_cache"}
+SEPARATORS = "/_-. "
+SEARCH_POOL = 64
+"""Matches collected before ranking; the best `limit` of them are returned."""
+SEARCH_SCAN = 4000
+"""Candidates checked per stage at most, which bounds the cost of one-letter queries."""
+
+
+def char_mask(text: str) -> int:
+    """64-bit set of the characters in `text` (folded modulo 64)."""
+    mask = 0
+    for char in text:
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+
+@dataclass
+class _SearchTable:
+    """The index laid out for search: every array is ordered by path length."""
+    order: np.ndarray
+    """Positions in `paths`, shortest path first."""
+    lowered: list[str]
+    names: list[str]
+    masks: np.ndarray
+    name_masks: np.ndarray
+
+    @classmethod
+    def build(cls, paths: list[str]) -> "_SearchTable":
+        order = np.argsort(np.fromiter(map(len, paths), dtype=np.int32, count=len(paths)), kind="stable")
+        lowered = [paths[i].lower() for i in order.tolist()]
+        names = [path[path.rfind("/") + 1:] for path in lowered]
+        masks = np.fromiter(map(char_mask, lowered), dtype=np.uint64, count=len(lowered))
+        name_masks = np.fromiter(map(char_mask, names), dtype=np.uint64, count=len(names))
+        return cls(order, lowered, names, masks, name_masks)
+
+
+@dataclass
+class _IgnoreRule:
+    pattern: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _glob_regex(pattern: str) -> str:
+    """Regex for a .gitignore glob: `*` and `?` stay within one path component, `**` spans any."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("(?:/.*)?")
+            i += 3
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[" and (end := pattern.find("]", i + 2)) > 0:
+            chars = pattern[i + 1:end]
+            out.append(f"[^{chars[1:]}]" if chars[0] in "!^" else f"[{chars}]")
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def _compile_rule(line: str) -> _IgnoreRule | None:
+    """One .gitignore line as a rule matched against paths relative to its directory."""
+    line = line.rstrip("\n").rstrip()
+    if not line or line.startswith("#"):
+        return None
+    negate = line.startswith("!")
+    if negate:
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.strip("/") if dir_only else line
+    anchored = "/" in line.lstrip("/") or line.startswith("/")
+    line = line.lstrip("/")
+    regex = _glob_regex(line)
+    if not anchored:
+        regex = r"(?:.*/)?" + regex
+    return _IgnoreRule(re.compile(regex + r"\Z"), negate, dir_only)
+
+
+def _read_ignore(directory: Path) -> list[_IgnoreRule]:
+    try:
+        lines = (directory / ".gitignore").read_text(encoding="utf-8", errors="replace").splitlines()
+    except OSError:
+        return []
+    return [rule for line in lines if (rule := _compile_rule(line)) is not None]
+
+
+def _ignored(rules: list[tuple[str, list[_IgnoreRule]]], path: str, is_dir: bool) -> bool:
+    """Apply .gitignore rules from the root down; the last matching rule wins."""
+    ignored = False
+    for base, base_rules in rules:
+        relative = path[len(base):] if base else path
+        for rule in base_rules:
+            if (is_dir or not rule.dir_only) and rule.pattern.match(relative):
+                ignored = not rule.negate
+    return ignored
+
+
+@dataclass
+class _Listing:
+    mtime_ns: int
+    files: list[str]
+    dirs: list[str]
+    rules: list[_IgnoreRule] = field(default_factory=list)
+
+
+class FileIndex:
+    """Relative paths of the files under `root`, searchable with `search`."""
+
+    def __init__(self, root: str | Path = ".", refresh_interval: float = 5.0) -> None:
+        self.root = Path(root).resolve()
+        self.refresh_interval = refresh_interval
+        self.paths: list[str] = []
+        self.ready = threading.Event()
+        self._table = _SearchTable.build([])
+        self._listings: dict[str, _Listing] = {}
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def refresh(self, force: bool = False) -> None:
+        """Re-scan in the background, at most once per `refresh_interval` unless `force`."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if not force and time.monotonic() - self._refreshed_at < self.refresh_interval:
+                return
+            self._thread = threading.Thread(target=self._refresh, daemon=True)
+            self._thread.start()
+
+    def _refresh(self) -> None:
+        try:
+            paths = self._git_files()
+            if paths is None:
+                paths = self._walk()
+            paths.sort()
+            self._set_paths(paths)
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+        finally:
+            self._refreshed_at = time.monotonic()
+            self.ready.set()
+
+    def _set_paths(self, paths: list[str]) -> None:
+        table = _SearchTable.build(paths)
+        # Swapped together; readers take both under the lock.
+        with self._lock:
+            self.paths, self._table = paths, table
+
+    def _git_files(self) -> list[str] | None:
+        git = shutil.which("git")
+        if git is None:
+            return None
+        process = subprocess.run(
+            [git, "ls-files", "--cached", "--others", "--exclude-standard", "-z"],
+            cwd=self.root,
+            capture_output=True,
+        )
+        if process.returncode != 0:
+            return None
+        files = process.stdout.decode(errors="replace").split("\0")
+        # Deleted-but-still-staged files are listed too; skip what is gone.
+        return [f for f in files if f and os.path.lexists(self.root / f)]
+
+    def _walk(self) -> list[str]:
+        """List the tree, reusing the listing of every directory whose mtime is unchanged."""
+        listings: dict[str, _Listing] = {}
+        paths: list[str] = []
+        stack: list[tuple[str, list[tuple[str, list[_IgnoreRule]]]]] = [("", [])]
+        while stack:
+            relative, parent_rules = stack.pop()
+            directory = self.root / relative
+            try:
+                mtime_ns = directory.stat().st_mtime_ns
+            except OSError:
+                continue
+            listing = self._listings.get(relative)
+            if listing is None or listing.mtime_ns != mtime_ns:
+                files, dirs = [], []
+                try:
+                    with os.scandir(directory) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name not in ALWAYS_SKIP:
+                                    dirs.append(entry.name)
+                            else:
+                                files.append(entry.name)
+                except OSError:
+                    continue
+                listing = _Listing(mtime_ns, files, dirs, _read_ignore(directory))
+            listings[relative] = listing
+            rules = parent_rules + [(relative, listing.rules)] if listing.rules else parent_rules
+            for name in listing.files:
+                path = f"{relative}{name}"
+                if name != ".gitignore" and not _ignored(rules, path, is_dir=False):
+                    paths.append(path)
+            for name in listing.dirs:
+                path = f"{relative}{name}"
+                if not _ignored(rules, path, is_dir=True):
+                    stack.append((f"{path}/", rules))
+        self._listings = listings
+        return paths
+
+    def search(self, query: str, limit: int = 10) -> list[str]:
+        """Paths containing the characters of `query` in order, best match first.
+
+        Contiguous matches, matches in the file name and matches at word
+        boundaries rank higher; ties go to shorter paths. A vectorized
+        character-set test narrows the candidates first, then shorter paths
+        are checked in order until enough matches are found, so the cost does
+        not grow with the size of the tree.
+        """
+        with self._lock:
+            paths, table = self.paths, self._table
+        query = query.lower()
+        if not query:
+            return [paths[i] for i in table.order[:limit].tolist()]
+        mask = np.uint64(char_mask(query))
+        in_name = np.flatnonzero((table.name_masks & mask) == mask)[:SEARCH_SCAN].tolist()
+        found: dict[int, None] = {}
+        stages = (
+            (in_name, table.names, str.__contains__),
+            (in_name, table.names, _subsequence),
+            (None, table.lowered, _subsequence),
+        )
+        for candidates, texts, matches in stages:
+            if candidates is None:
+                candidates = np.flatnonzero((table.masks & mask) == mask)[:SEARCH_SCAN].tolist()
+            for i in candidates:
+                if i not in found and matches(texts[i], query):
+                    found[i] = None
+                    if len(found) >= SEARCH_POOL:
+                        break
+            if len(found) >= SEARCH_POOL:
+                break
+        ranked = sorted(found, key=lambda i: -_score(query, table.lowered[i]))
+        return [paths[i] for i in table.order[ranked[:limit]].tolist()] if ranked else []
+
+
+def _subsequence(text: str, query: str) -> bool:
+    position = 0
+    for char in query:
+        position = text.find(char, position)
+        if position < 0:
+            return False
+        position += 1
+    return True
+
+
+def _score(query: str, path: str) -> float:
+    lowered = path.lower()
+    name_start = lowered.rfind("/") + 1
+    score = -0.1 * len(path)
+    if (found := lowered.find(query, name_start)) >= 0:
+        return score + 200 + (50 if found == name_start else 0)
+    if query in lowered:
+        return score + 100
+    position = 0
+    previous = -2
+    for char in query:
+        position = lowered.find(char, position)
+        if position == previous + 1:
+            score += 10
+        if position == 0 or lowered[position - 1] in SEPARATORS:
+            score += 8
+        if position >= name_start:
+            score += 5
+        previous = position
+        position += 1
+    return score
+
+
+file_index = FileIndex()
+"""Index of the current working directory."""
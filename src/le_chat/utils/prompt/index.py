@@ -0,0 +1,197 @@
+"""Persistent full-text index over a directory, for `@dir/` references.
+
+Each directory gets an SQLite database under the user cache holding its text
+files split into line-aligned chunks (FTS5). The index is refreshed in a
+background thread, re-reading only files whose mtime or size changed, and
+queries run against whatever is indexed at the time, so they never wait on
+re-indexing.
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+import hashlib
+import os
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterator, List
+
+from le_chat.utils.cache import cache_dir
+from le_chat.utils.prompt.budget import query_terms, split_chunks
+from le_chat.utils.prompt.resource import SNIFF_BYTES, sniff_type, text_encoding
+
+MAX_FILE_BYTES = 1024 * 1024
+"""Larger files are skipped; they are rarely source code."""
+SKIP_DIRS = {".git", ".hg", ".svn", "node_modules", "__pycache__", ".venv", "venv", ".mypy_cache", ".pytest_cache", "build", "dist"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks USING fts5(
+    text, path UNINDEXED, start_line UNINDEXED, end_line UNINDEXED, tokenize = 'unicode61'
+);
+"""
+
+
+@dataclass
+class Hit:
+    path: Path
+    start_line: int
+    end_line: int
+    """Exclusive."""
+    text: str
+
+
+def iter_text_files(root: Path) -> Iterator[tuple[Path, os.stat_result]]:
+    """Files under `root` worth indexing, skipping hidden and build directories."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+        for name in filenames:
+            if name.startswith("."):
+                continue
+            path = Path(dirpath, name)
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if stat.st_size <= MAX_FILE_BYTES:
+                yield path, stat
+
+
+def _read_text(path: Path) -> str | None:
+    try:
+        with path.open("rb") as f:
+            head = f.read(SNIFF_BYTES)
+            sniffed = sniff_type(path, head)
+            if sniffed is None or sniffed[1] != "text":
+                return None
+            return (head + f.read()).decode(text_encoding(head), errors="replace")
+    except OSError:
+        return None
+
+
+class DirectoryIndex:
+    """Chunked full-text index of the text files under `root`."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root.resolve()
+        key = hashlib.sha256(str(self.root).encode()).hexdigest()[:32]
+        self.db_path = cache_dir("index") / f"{key}.sqlite"
+        self.ready = threading.Event()
+        """Set once the index has been built at least once."""
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: threading.Thread | None = None
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            if db.execute("SELECT 1 FROM files LIMIT 1").fetchone():
+                self.ready.set()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection that commits (or rolls back) and closes on exit."""
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # WAL lets queries read while a refresh is writing.
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def update(self) -> tuple[int, int]:
+        """Bring the index in line with the directory.
+
+        Returns:
+            (files re-indexed, files removed).
+        """
+        with self._connect() as db:
+            known = {path: (mtime, size) for path, mtime, size in db.execute("SELECT path, mtime_ns, size FROM files")}
+        changed = removed = 0
+        seen = set()
+        for path, stat in iter_text_files(self.root):
+            name = str(path)
+            seen.add(name)
+            if known.get(name) == (stat.st_mtime_ns, stat.st_size):
+                continue
+            text = _read_text(path)
+            # One transaction per file keeps queries responsive during a large refresh.
+            with self._connect() as db:
+                db.execute("DELETE FROM chunks WHERE path = ?", (name,))
+                if text is not None:
+                    db.executemany(
+                        "INSERT INTO chunks (text, path, start_line, end_line) VALUES (?, ?, ?, ?)",
+                        [(c.text, name, c.start_line, c.end_line) for c in split_chunks(text)],
+                    )
+                # Binary files are recorded too, so they are not sniffed again.
+                db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (name, stat.st_mtime_ns, stat.st_size))
+            changed += 1
+        if gone := [name for name in known if name not in seen]:
+            with self._connect() as db:
+                for name in gone:
+                    db.execute("DELETE FROM chunks WHERE path = ?", (name,))
+                    db.execute("DELETE FROM files WHERE path = ?", (name,))
+                removed = len(gone)
+        self.ready.set()
+        return changed, removed
+
+    def refresh(self) -> threading.Thread:
+        """Run `update` in a background thread, unless one is already running."""
+        with self._refresh_lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(target=self._refresh, daemon=True)
+                self._refresh_thread.start()
+            return self._refresh_thread
+
+    def _refresh(self) -> None:
+        try:
+            self.update()
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+
+    def search(self, query: str, k: int = 8) -> List[Hit]:
+        """The `k` chunks most relevant to `query` (BM25), best first."""
+        terms = sorted(set(query_terms(query)))
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT path, start_line, end_line, text FROM chunks WHERE chunks MATCH ? ORDER BY bm25(chunks) LIMIT ?",
+                (match, k),
+            ).fetchall()
+        return [Hit(Path(path), start, end, text) for path, start, end, text in rows]
+
+
+class DirectoryIndexes:
+    """One `DirectoryIndex` per directory for the whole process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._indexes: dict[Path, DirectoryIndex] = {}
+
+    def get(self, root: Path) -> DirectoryIndex:
+        root = root.resolve()
+        with self._lock:
+            if (index := self._indexes.get(root)) is None:
+                index = self._indexes[root] = DirectoryIndex(root)
+            return index
+
+    def refresh(self, root: Path) -> DirectoryIndex:
+        """Start a background refresh of `root`'s index and return it."""
+        index = self.get(root)
+        index.refresh()
+        return index
+
+    def search(self, root: Path, query: str, k: int = 8, first_build_timeout: float = 10.0) -> List[Hit]:
+        """Query `root`'s index and refresh it in the background.
+
+        Only a directory that has never been indexed is waited for (up to
+        `first_build_timeout` seconds); otherwise the current index answers
+        straight away while changes are picked up for the next prompt.
+        """
+        index = self.refresh(root)
+        if not index.ready.is_set():
+            index.ready.wait(first_build_timeout)
+        return index.search(query, k)
+
+
+directory_indexes = DirectoryIndexes()
@@ -1,18 +1,120 @@
-from dataclasses import dataclass
+import codecs
+from collections import OrderedDict
 import mimetypes
+import mmap
+import os
 from pathlib import Path
+import threading
 from typing import Literal
 
 ResourceType = Literal["text", "image", "audio"]
 
+SNIFF_BYTES = 8192
+"""How much of a file is read to decide its type."""
+PREFETCH_BLOCK_BYTES = 1024 * 1024
+MMAP_MIN_BYTES = 1024 * 1024
+"""Smaller images and audio are read into memory rather than mapped."""
+
 
-@dataclass
 class Resource:
-    path: Path
-    mime_type: str
-    resource_type: ResourceType
-    text: str | None
-    data: bytes | None
+    """A file attachment whose contents are only read when asked for.
+
+    The type is known up front (see `sniff_type`); `text` decodes the file on
+    first access and `data` reads or memory-maps it, so validating an
+    attachment never reads more than its header. `close` releases a mapping.
+    """
+
+    def __init__(self, path: Path, mime_type: str, resource_type: ResourceType) -> None:
+        self.path = path
+        self.mime_type = mime_type
+        self.resource_type = resource_type
+        self._text: str | None = None
+        self._data: mmap.mmap | bytes | None = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"Resource({str(self.path)!r}, mime_type={self.mime_type!r}, resource_type={self.resource_type!r})"
+
+    @property
+    def loaded(self) -> bool:
+        return self._text is not None or self._data is not None
+
+    @property
+    def text(self) -> str | None:
+        """Contents of a text resource, decoded as `text_encoding` detects; None for images and audio."""
+        if self.resource_type != "text":
+            return None
+        with self._lock:
+            if self._text is None:
+                try:
+                    self._text = self._read_text()
+                except FileNotFoundError:
+                    raise ResourceReadError(f"File not found {str(self.path)!r}")
+                except Exception as error:
+                    raise ResourceReadError(f"Failed to read {str(self.path)!r}; {error}")
+            return self._text
+
+    def _read_text(self) -> str:
+        # Decoded block by block so other threads (the UI) get the GIL in between.
+        parts = []
+        with self.path.open("rb") as f:
+            block = f.read(PREFETCH_BLOCK_BYTES)
+            decoder = codecs.getincrementaldecoder(text_encoding(block))(errors="replace")
+            while block:
+                parts.append(decoder.decode(block))
+                block = f.read(PREFETCH_BLOCK_BYTES)
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+
+    def prefetch(self) -> None:
+        """Pull the file into the OS page cache without decoding it.
+
+        Reads release the GIL, so this can run on a worker thread while the UI
+        stays responsive; the later `text` / `data` access is then served
+        from memory.
+        """
+        if self.loaded:
+            return
+        try:
+            with self.path.open("rb", buffering=0) as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+                    return
+                buffer = bytearray(PREFETCH_BLOCK_BYTES)
+                while f.readinto(buffer):
+                    pass
+        except OSError:
+            pass
+
+    @property
+    def data(self) -> mmap.mmap | bytes | None:
+        """Contents of an image or audio resource, memory-mapped if large; None for text."""
+        if self.resource_type == "text":
+            return None
+        with self._lock:
+            if self._data is None:
+                try:
+                    with self.path.open("rb") as f:
+                        if os.fstat(f.fileno()).st_size < MMAP_MIN_BYTES:
+                            self._data = f.read()
+                        else:
+                            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except FileNotFoundError:
+                    raise ResourceReadError(f"File not found {str(self.path)!r}")
+                except Exception as error:
+                    raise ResourceReadError(f"Failed to read {str(self.path)!r}; {error}")
+            return self._data
+
+    def close(self) -> None:
+        """Unmap the contents (closing the mapping's file descriptor); they are read again if needed."""
+        with self._lock:
+            if isinstance(self._data, mmap.mmap):
+                try:
+                    self._data.close()
+                except BufferError:
+                    # Still exported to a reader; the mapping closes when it is collected.
+                    pass
+            self._data = None
 
 
 class ResourceError(Exception):
@@ -49,59 +151,210 @@ IMAGE_MIME_PREFIXES = ("image/",)
 AUDIO_MIME_PREFIXES = ("audio/",)
 
 
-def load_resource(path: Path) -> Resource:
-    """Load a resource from the project directory.
+# (offset, signature, mime type); RIFF and ISO-BMFF containers are told apart by their form type.
+MAGIC_SIGNATURES: list[tuple[int, bytes, str]] = [
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (8, b"WEBP", "image/webp"),
+    (0, b"BM", "image/bmp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (8, b"WAVE", "audio/wav"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"ID3", "audio/mpeg"),
+    (8, b"AIFF", "audio/aiff"),
+    (8, b"AIFC", "audio/aiff"),
+    (0, b"\x1aE\xdf\xa3", "audio/webm"),
+    (4, b"ftypheic", "image/heic"),
+    (4, b"ftypavif", "image/avif"),
+    (4, b"ftypM4A", "audio/mp4"),
+]
+
+
+UTF16_BOMS = (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+LEGACY_TEXT_ENCODING = "cp1252"
+"""Used for text that is not UTF-8 or UTF-16; a superset of the printable Latin-1."""
+# Control bytes other than whitespace (tab, newline, vertical tab, form feed, carriage return).
+CONTROL_BYTES = bytes([*range(0x00, 0x09), *range(0x0E, 0x20), 0x7F])
+
+
+def _is_utf8(head: bytes) -> bool:
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as error:
+        # A multi-byte character cut off at the end of a sample is fine; a shorter head is the whole file.
+        return len(head) >= SNIFF_BYTES and error.start >= len(head) - 3 and error.reason == "unexpected end of data"
+    return True
 
-    Only text, image, and audio files are supported.
+
+def text_encoding(head: bytes) -> str:
+    """The encoding to read a text file with, from its first bytes.
+
+    UTF-16 is recognized by its BOM, anything else that is not UTF-8 is
+    read as `LEGACY_TEXT_ENCODING`. Decode with `errors="replace"`.
+    """
+    if head.startswith(UTF16_BOMS):
+        return "utf-16"
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    return "utf-8" if _is_utf8(head) else LEGACY_TEXT_ENCODING
+
+
+def _looks_like_text(head: bytes) -> bool:
+    if head.startswith(UTF16_BOMS):
+        return True
+    # UTF-8, Latin-1, cp1252 and the like; NUL is a control byte too.
+    return len(head.translate(None, CONTROL_BYTES)) == len(head)
+
+
+def sniff_type(path: Path, head: bytes) -> tuple[str, ResourceType] | None:
+    """Decide a file's mime type and resource type from its first bytes.
+
+    A known extension decides the type: image and audio extensions (the
+    signature, if any, refines the mime type), so e.g. an SVG stays an image,
+    and text extensions, whatever their encoding. For other files, text is
+    UTF-16 with a BOM, or anything without control bytes other than
+    whitespace; binaries are identified by their signature.
+
+    Returns:
+        (mime type, resource type), or None if the file is not supported.
+    """
+    guessed, _ = mimetypes.guess_file_type(path)
+    if guessed is not None and guessed.startswith(IMAGE_MIME_PREFIXES + AUDIO_MIME_PREFIXES):
+        return _sniff_media(head) or (guessed, "image" if guessed.startswith(IMAGE_MIME_PREFIXES) else "audio")
+    if guessed is not None and (guessed.startswith(TEXT_MIME_PREFIXES) or guessed in TEXT_MIME_TYPES):
+        return guessed, "text"
+    if _looks_like_text(head):
+        return "text/plain", "text"
+    return _sniff_media(head)
+
+
+def _sniff_media(head: bytes) -> tuple[str, ResourceType] | None:
+    for offset, signature, mime_type in MAGIC_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type, "image" if mime_type.startswith(IMAGE_MIME_PREFIXES) else "audio"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return "audio/mpeg", "audio"  # MPEG audio frame sync without an ID3 tag
+    return None
+
+
+def read_resource(path: Path) -> Resource:
+    """Open a resource without going through the cache.
+
+    Only the first `SNIFF_BYTES` are read here; the contents are loaded when
+    the returned resource's `text` or `data` is accessed.
 
     Args:
         path: Path to the resource file.
 
     Returns:
-        A Resource with either text or data populated.
+        A lazy Resource.
 
     Raises:
         ResourceReadError: If the file cannot be read.
         ResourceUnsupportedType: If the file type is not text, image, or audio.
     """
-    resource_path = path
-
-    mime_type, _ = mimetypes.guess_file_type(resource_path)
-    if mime_type is None:
-        mime_type = "text/plain"  # Default to text for unknown types
-
-    data: bytes | None = None
-    text: str | None = None
-
-    # Determine the resource type
-    resource_type: ResourceType
-    if mime_type.startswith(IMAGE_MIME_PREFIXES):
-        resource_type = "image"
-    elif mime_type.startswith(AUDIO_MIME_PREFIXES):
-        resource_type = "audio"
-    elif mime_type.startswith(TEXT_MIME_PREFIXES) or mime_type in TEXT_MIME_TYPES:
-        resource_type = "text"
-    else:
-        raise ResourceUnsupportedType(
-            f"Unsupported file type {mime_type!r} for {str(path)!r}. "
-            "Only text, image, and audio files are allowed."
-        )
-
     try:
-        if resource_type in ("image", "audio"):
-            data = resource_path.read_bytes()
-        else:
-            text = resource_path.read_text(encoding="utf-8", errors="replace")
+        with path.open("rb") as f:
+            head = f.read(SNIFF_BYTES)
     except FileNotFoundError:
         raise ResourceReadError(f"File not found {str(path)!r}")
     except Exception as error:
         raise ResourceReadError(f"Failed to read {str(path)!r}; {error}")
 
-    resource = Resource(
-        resource_path,
-        mime_type=mime_type,
-        resource_type=resource_type,
-        text=text,
-        data=data,
-    )
-    return resource
\ No newline at end of file
+    if (sniffed := sniff_type(path, head)) is None:
+        guessed, _ = mimetypes.guess_file_type(path)
+        raise ResourceUnsupportedType(
+            f"Unsupported file type {guessed or 'application/octet-stream'!r} for {str(path)!r}. "
+            "Only text, image, and audio files are allowed."
+        )
+    mime_type, resource_type = sniffed
+    return Resource(path, mime_type=mime_type, resource_type=resource_type)
+
+
+class ResourceCache:
+    """Least-recently-used cache of loaded resources with a byte budget.
+
+    Entries are keyed by resolved path, mtime and size, so a file edited
+    between prompts is read again. Each entry is charged its file size, the
+    most it can hold once loaded; resources larger than the whole budget are
+    returned but not kept.
+
+    Args:
+        max_bytes: Total file size of cached resources.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[tuple[Path, int, int], tuple[Resource, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Resource:
+        """Return the resource at `path`, reading it only if it is not cached or has changed.
+
+        Raises:
+            ResourceReadError: If the file cannot be read.
+            ResourceUnsupportedType: If the file type is not text, image, or audio.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise ResourceReadError(f"File not found {str(path)!r}")
+        except OSError as error:
+            raise ResourceReadError(f"Failed to read {str(path)!r}; {error}")
+        key = (path.resolve(), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        resource = read_resource(path)
+        size = stat.st_size
+        if size > self.max_bytes:
+            return resource
+        with self._lock:
+            if key not in self._entries:
+                # Older versions of the same file can never be hit again.
+                for stale in [k for k in self._entries if k[0] == key[0]]:
+                    self._evict(stale)
+                self._entries[key] = (resource, size)
+                self.size += size
+            while self.size > self.max_bytes:
+                self._evict(next(iter(self._entries)))
+        return resource
+
+    def _evict(self, key: tuple[Path, int, int]) -> None:
+        resource, size = self._entries.pop(key)
+        self.size -= size
+        resource.close()
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._evict(key)
+
+
+resource_cache = ResourceCache()
+"""Shared by prompt validation and the agents' prompt builders."""
+
+
+def load_resource(path: Path) -> Resource:
+    """Load a resource from the project directory, through `resource_cache`.
+
+    Validating a prompt and building it for the model read each attachment once.
+
+    Args:
+        path: Path to the resource file.
+
+    Returns:
+        A Resource with either text or data populated.
+
+    Raises:
+        ResourceReadError: If the file cannot be read.
+        ResourceUnsupportedType: If the file type is not text, image, or audio.
+    """
+    return resource_cache.get(path)
@@ -0,0 +1,196 @@
+"""Live count of the tokens a prompt will add to the model's context."""
+from collections import OrderedDict
+from dataclasses import dataclass
+import glob
+import math
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Callable, Iterable
+
+from le_chat.utils.cache import content_hash
+from le_chat.utils.image_io import PIXELS_PER_TOKEN, target_size
+from le_chat.utils.prompt.extract import GLOB_CHARS, expand_glob, extract_paths_from_prompt, is_glob
+from le_chat.utils.prompt.resource import ResourceError, load_resource
+
+RE_PARAGRAPH_END = re.compile(r"(?<=\n)(?=\s*\n)")
+PARAGRAPH_CACHE_SIZE = 4096
+MAX_BYTES_PER_TOKEN = 32
+"""No tokenizer packs more bytes into a token, so a larger file is over budget without counting it."""
+DIRECTORY_HIT_TOKENS = 400
+"""About one retrieved chunk (see `split_chunks`); @directory hits are not known before the prompt is sent."""
+
+
+@dataclass
+class PromptTokens:
+    text: int = 0
+    attachments: int = 0
+    history: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.text + self.attachments + self.history
+
+    def label(self) -> str:
+        parts = [f"{self.text:,} prompt"]
+        if self.attachments:
+            parts.append(f"{self.attachments:,} files")
+        if self.history:
+            parts.append(f"{self.history:,} history")
+        return f"{self.total:,} tokens ({' + '.join(parts)})"
+
+
+def _glob_dirs(pattern: str) -> dict[str, int]:
+    """The mtimes of the directories expanding `pattern` walks.
+
+    That is its base directory (the deepest one before the first glob
+    character) and every directory matched by a prefix of it, so for `**`
+    every directory below the base. Adding or removing a file anywhere the
+    glob looks changes one of them.
+
+    Raises:
+        OSError: If the base directory does not exist.
+    """
+    parts = Path(os.path.expanduser(pattern)).parts[:-1]
+    root = []
+    for part in parts:
+        if not GLOB_CHARS.isdisjoint(part):
+            break
+        root.append(part)
+    base = os.path.join(*root) if root else "."
+    mtimes = {base: os.stat(base).st_mtime_ns}
+    for end in range(len(root) + 1, len(parts) + 1):
+        for directory in glob.iglob(os.path.join(*parts[:end]), recursive=True):
+            if not os.path.isdir(directory):
+                continue
+            try:
+                mtimes[directory] = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+    return mtimes
+
+
+class PromptTokenCounter:
+    """Counts prompt, attachment and history tokens, reusing earlier counts.
+
+    Meant to be called on every (debounced) edit from a worker thread. The
+    prompt is counted paragraph by paragraph so only edited paragraphs are
+    tokenized again, attachments once per content hash, and history messages
+    once each. Globs are expanded again only when the mtime of a directory
+    they walk changes. Attachments are counted as `build` will include them: text
+    within the attachment budgets, images at their downscaled size. Audio is
+    not counted.
+
+    Args:
+        count_tokens: The model's token counter.
+        history: Returns the contents of the messages already in the context.
+    """
+
+    def __init__(
+        self,
+        count_tokens: Callable[[str], int],
+        history: Callable[[], Iterable[str]],
+        attachment_budget: int = 4096,
+        prompt_budget: int = 16384,
+        directory_top_k: int = 8,
+        image_max_side: int | None = None,
+        image_max_pixels: int | None = None,
+    ) -> None:
+        self.count_tokens = count_tokens
+        self.history = history
+        self.attachment_budget = attachment_budget
+        self.prompt_budget = prompt_budget
+        self.directory_top_k = directory_top_k
+        self.image_max_side = image_max_side
+        self.image_max_pixels = image_max_pixels
+        self._paragraphs: OrderedDict[str, int] = OrderedDict()
+        self._files: dict[str, int] = {}
+        """Tokens of a file, by content hash."""
+        self._messages: dict[str, int] = {}
+        self._globs: dict[str, tuple[dict[str, int], list[Path]]] = {}
+        """Files a glob expanded to, with the mtimes of the directories it walked at the time."""
+        self._lock = threading.Lock()
+
+    def count(self, prompt: str) -> PromptTokens:
+        with self._lock:
+            return PromptTokens(
+                text=self._count_text(prompt),
+                attachments=self._count_attachments(prompt),
+                history=self._count_history(),
+            )
+
+    def _count_text(self, prompt: str) -> int:
+        total = 0
+        for paragraph in RE_PARAGRAPH_END.split(prompt):
+            if (tokens := self._paragraphs.get(paragraph)) is None:
+                tokens = self._paragraphs[paragraph] = self.count_tokens(paragraph)
+                if len(self._paragraphs) > PARAGRAPH_CACHE_SIZE:
+                    self._paragraphs.popitem(last=False)
+            else:
+                self._paragraphs.move_to_end(paragraph)
+            total += tokens
+        return total
+
+    def _count_attachments(self, prompt: str) -> int:
+        text = images = 0
+        for path, _, _ in extract_paths_from_prompt(prompt):
+            if is_glob(path):
+                try:
+                    paths = self._glob_paths(path)
+                except OSError:
+                    # Base directory still being typed.
+                    continue
+            elif Path(path).is_dir():
+                text += self.directory_top_k * DIRECTORY_HIT_TOKENS
+                continue
+            else:
+                paths = [Path(path)]
+            for file in paths:
+                try:
+                    resource = load_resource(file)
+                    if resource.resource_type == "text":
+                        text += min(self._text_tokens(file), self.attachment_budget)
+                    elif resource.resource_type == "image":
+                        images += self._image_tokens(file)
+                except (OSError, ResourceError):
+                    # Still being typed, or will be reported on submit.
+                    continue
+        return min(text, self.prompt_budget) + images
+
+    def _glob_paths(self, pattern: str) -> list[Path]:
+        mtimes = _glob_dirs(pattern)
+        cached = self._globs.get(pattern)
+        if cached is None or cached[0] != mtimes:
+            cached = self._globs[pattern] = (mtimes, [resource.path for resource in expand_glob(pattern).resources])
+        return cached[1]
+
+    def _text_tokens(self, path: Path) -> int:
+        if path.stat().st_size > self.attachment_budget * MAX_BYTES_PER_TOKEN:
+            return self.attachment_budget
+        key = content_hash(path)
+        if (tokens := self._files.get(key)) is None:
+            tokens = self._files[key] = self.count_tokens(load_resource(path).text)
+        return tokens
+
+    def _image_tokens(self, path: Path) -> int:
+        from PIL import Image  # Lazy import
+
+        key = f"{content_hash(path)}\0{self.image_max_side}\0{self.image_max_pixels}"
+        if (tokens := self._files.get(key)) is None:
+            # Only the header is read to get the size.
+            with Image.open(path) as image:
+                width, height = target_size(image.width, image.height, self.image_max_side, self.image_max_pixels)
+            tokens = self._files[key] = math.ceil(width * height / PIXELS_PER_TOKEN)
+        return tokens
+
+    def _count_history(self) -> int:
+        contents = list(self.history())
+        # Rebuilt each time so messages that left the history are forgotten.
+        messages = {}
+        for content in contents:
+            if content not in messages:
+                tokens = self._messages.get(content)
+                messages[content] = tokens if tokens is not None else self.count_tokens(content)
+        self._messages = messages
+        return sum(messages[content] for content in contents)
@@ -0,0 +1,153 @@
+from dataclasses import dataclass
+from typing import Callable, Protocol, runtime_checkable
+
+from textual import containers
+from textual.geometry import Region, Spacing
+from textual.widget import Widget
+
+KEEP_LAST = 4
+"""The latest widgets (the turn being written) are never collapsed."""
+
+
+@runtime_checkable
+class Restorable(Protocol):
+    def snapshot(self) -> Callable[[], Widget]:
+        """A factory for an equivalent widget, called when it scrolls back into view."""
+
+
+@dataclass
+class Collapsed:
+    """A widget taken out of the DOM: how to rebuild it and the space it took."""
+    restore: Callable[[], Widget]
+    height: int
+    margin: Spacing
+
+
+class TurnPlaceholder(Widget):
+    """Stands in for one or more consecutive collapsed widgets, taking exactly their space."""
+
+    DEFAULT_CSS = """
+    TurnPlaceholder {
+        width: 100%;
+    }
+    """
+
+    def __init__(self, items: list[Collapsed]) -> None:
+        super().__init__()
+        self.items = items
+        # Vertical margins between siblings collapse to the larger of the two.
+        gaps = sum(max(above.margin.bottom, below.margin.top) for above, below in zip(items, items[1:]))
+        self.styles.height = sum(item.height for item in items) + gaps
+        self.styles.margin = (items[0].margin.top, 0, items[-1].margin.bottom, 0)
+
+    def render(self) -> str:
+        return ""
+
+
+class ChatView(containers.VerticalScroll, can_focus=False):
+    """Scrolling list of turns that keeps only what is near the viewport mounted.
+
+    Widgets more than `collapse_screens` screen heights away from the
+    viewport are replaced with a `TurnPlaceholder` of the same size and
+    margins, so the layout and scroll position do not move, and runs of
+    far-away placeholders are merged into one. Placeholders that come within
+    `restore_screens` of the viewport are swapped back for rebuilt widgets.
+    A long session therefore keeps about the same number of widgets mounted
+    however many turns it has. Only widgets implementing `Restorable` are
+    collapsed.
+    """
+
+    def __init__(
+        self,
+        *children: Widget,
+        id: str | None = None,
+        restore_screens: float = 1.0,
+        collapse_screens: float = 2.0,
+    ) -> None:
+        super().__init__(*children, id=id)
+        self.restore_screens = restore_screens
+        self.collapse_screens = collapse_screens
+        self._update_pending = False
+
+    def on_mount(self) -> None:
+        self.watch(self, "scroll_y", self._schedule_update, init=False)
+        # Grows as turns are added and streamed.
+        self.watch(self, "virtual_size", self._schedule_update, init=False)
+
+    def on_resize(self) -> None:
+        self._schedule_update()
+
+    def _schedule_update(self) -> None:
+        if not self._update_pending:
+            self._update_pending = True
+            self.call_after_refresh(self._update_virtualization)
+
+    async def _update_virtualization(self) -> None:
+        self._update_pending = False
+        height = self.scrollable_content_region.height
+        if not height:
+            return
+        top = self.scroll_y
+        bottom = top + height
+
+        def within(region: Region, screens: float) -> bool:
+            margin = height * screens
+            return region.bottom >= top - margin and region.y <= bottom + margin
+
+        children = list(self.children)
+        changed = False
+        run: list[TurnPlaceholder] = []
+        for child in children[:-KEEP_LAST] if len(children) > KEEP_LAST else []:
+            region = child.virtual_region_with_margin
+            if isinstance(child, TurnPlaceholder):
+                if within(region, self.restore_screens):
+                    await self.mount_all(self._split(child, lambda r: within(r, self.restore_screens)), before=child)
+                    await child.remove()
+                    changed = True
+                elif not within(region, self.collapse_screens):
+                    run.append(child)
+                    continue
+            elif (
+                isinstance(child, Restorable)
+                # Not laid out yet (e.g. a restored Markdown still mounting its blocks).
+                and child.outer_size.height
+                and not within(region, self.collapse_screens)
+            ):
+                collapsed = Collapsed(child.snapshot(), child.outer_size.height, child.styles.margin)
+                await self.mount(placeholder := TurnPlaceholder([collapsed]), before=child)
+                await child.remove()
+                changed = True
+                run.append(placeholder)
+                continue
+            changed |= await self._merge(run)
+            run = []
+        changed |= await self._merge(run)
+        if changed:
+            # Restored widgets may differ in height from what they replaced.
+            self._schedule_update()
+
+    def _split(self, placeholder: TurnPlaceholder, near: Callable[[Region], bool]) -> list[Widget]:
+        """Rebuilt widgets for the items of `placeholder` that are `near`, placeholders for the rest."""
+        widgets: list[Widget] = []
+        far: list[Collapsed] = []
+        y = placeholder.virtual_region.y
+        for index, item in enumerate(placeholder.items):
+            if near(Region(0, y - item.margin.top, 1, item.height + item.margin.height)):
+                if far:
+                    widgets.append(TurnPlaceholder(far))
+                    far = []
+                widgets.append(item.restore())
+            else:
+                far.append(item)
+            if index + 1 < len(placeholder.items):
+                y += item.height + max(item.margin.bottom, placeholder.items[index + 1].margin.top)
+        if far:
+            widgets.append(TurnPlaceholder(far))
+        return widgets
+
+    async def _merge(self, run: list[TurnPlaceholder]) -> bool:
+        if len(run) < 2:
+            return False
+        await self.mount(TurnPlaceholder([item for placeholder in run for item in placeholder.items]), before=run[0])
+        await self.remove_children(run)
+        return True
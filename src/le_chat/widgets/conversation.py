@@ -1,19 +1,26 @@
-from asyncio import sleep
+from asyncio import Lock, sleep
 from pathlib import Path
+import time
 import llm
 from textual import containers, getters, on, work
+from textual.actions import SkipAction
 from textual.app import ComposeResult
 from textual.binding import Binding
 from textual.reactive import reactive, var
 from textual.widgets import Input
 
 from le_chat.agent.agent import AgentBase, AgentFail, AgentLoading, AgentReady
+from le_chat.agent.stt_model.base import STTChunkTranscribed, STTFullTranscriptionReady, STTModelFail
 from le_chat.app import ChatApp
-from le_chat.utils.prompt.extract import extract_paths_from_prompt, validate_input_files
+from le_chat.audio import AudioProcessor
+from le_chat.speech import SpeechFirstAudio, SpeechPipeline
+from le_chat.utils.prompt.extract import extract_paths_from_prompt, is_glob, validate_input_files_async
+from le_chat.widgets.chat_view import ChatView
 from le_chat.widgets.prompt import Prompt, UserInputSubmitted
 from le_chat.widgets.throbber import Throbber
 from le_chat.widgets.user_input import UserInput
 from le_chat.widgets.response import Response, ResponseMetadataUpdate, ResponseUpdate
+from le_chat.widgets.stt_response import STTResponseUpdate
 
 
 SYSTEM = "You are the HAL 9000 the AI from the movie 2001 Space Odyssey and you are sentient. Have fun with user pretending you are this."
@@ -30,6 +37,18 @@ class Conversation(containers.Vertical):
             tooltip="Stop the current generation",
             priority=True,
         ),
+        Binding(
+            "f4",
+            "toggle_voice",
+            "Talk",
+            tooltip="Start / stop speaking a prompt",
+        ),
+        Binding(
+            "f6",
+            "toggle_speech",
+            "Speak",
+            tooltip="Read responses aloud as they are generated",
+        ),
     ]
     
     model_name = var("gpt-4o")
@@ -47,10 +66,24 @@ class Conversation(containers.Vertical):
     # mlx-community/LFM2.5-1.2B-Thinking-8bit
     # mlx-community/LFM2.5-1.2B-Thinking-bf16
     model_name: var[str | None] = var("mlx-community/medgemma-1.5-4b-it-4bit")
+    stt_model_name: var[str] = var("mlx-community/parakeet-tdt-0.6b-v2")
+    tts_model_name: var[str] = var("mlx-community/Kokoro-82M-bf16")
+    speak_responses: var[bool] = var(False)
 
     def __init__(self):
         super().__init__()
         self._agent_response: Response | None = None
+        # Keeps prompts in submission order while their attachments load.
+        self._submit_lock = Lock()
+        # Push-to-talk state
+        self._voice_model = None
+        # Set while the STT model loads, so a second press cannot start another load.
+        self._voice_starting = False
+        self._voice_processor: AudioProcessor | None = None
+        self._voice_text: list[str] = []
+        self._speech_ended_at: float | None = None
+        # Spoken output
+        self._speech: SpeechPipeline | None = None
     
     async def on_mount(self) -> None:
         self.post_message(AgentLoading(loading_message=f"Loading {self.model_name}..."))
@@ -59,7 +92,7 @@ class Conversation(containers.Vertical):
     def compose(self) -> ComposeResult:
         yield Throbber(id="throbber")
         with containers.Vertical(id="chat-layout"):
-            yield containers.Vertical(id="chat-view")
+            yield ChatView(id="chat-view")
             yield Prompt(id="user-prompt")
  
     @work(thread=True)
@@ -73,30 +106,54 @@ class Conversation(containers.Vertical):
     @on(UserInputSubmitted)
     async def on_input(self, event: UserInputSubmitted) -> None:
         event.stop()
-        success, msg = validate_input_files(event.body, allowed_types={"audio", "text", "image"})
+        self.query_one("#user-prompt", Prompt).clear()
+        self.submit_prompt(event.body)
+
+    @work(group="submit")
+    async def submit_prompt(self, body: str) -> None:
+        """Check and load the prompt's attachments off the event loop, then send it."""
         prompt_widget: Prompt = self.query_one("#user-prompt")
-        if not success:
-            prompt_widget.warning_message = msg
-            return
-        else:
-            prompt_widget.clear()
+        async with self._submit_lock:
+            success, msg = await validate_input_files_async(
+                body,
+                allowed_types={"audio", "text", "image"},
+                on_progress=prompt_widget.show_attachment_progress,
+            )
+            if not success:
+                if not prompt_widget.text:
+                    # Give the prompt back so it can be fixed.
+                    prompt_widget.text = body
+                prompt_widget.warning_message = msg
+                return
+            if any(is_glob(path) for path, _, _ in extract_paths_from_prompt(body)):
+                self.notify(msg, title="Attaching")
+            await self._send_prompt(body)
 
-            
+    async def _send_prompt(self, body: str) -> None:
         chat_view = self.query_one("#chat-view")
-        await chat_view.mount(userInput := UserInput(event.body))
+        await chat_view.mount(userInput := UserInput(body))
         userInput.scroll_visible()
         self._agent_response = response = Response()
         await chat_view.mount(response)
         response.scroll_to_center(self)
         response.border_title = self.model_name.upper()
-        self.send_prompt_to_agent(event.body)
+        if self._speech is not None and self.speak_responses:
+            self._speech.cancel()
+            self._speech.begin(self)
+        self.send_prompt_to_agent(body)
     
     @on(ResponseUpdate)
     async def on_response_update(self, event: ResponseUpdate) -> None:
         event.stop()
+        if self._speech_ended_at is not None:
+            latency = time.perf_counter() - self._speech_ended_at
+            self._speech_ended_at = None
+            self.notify(f"End of speech → first token: {latency:.2f}s", title="Voice")
         if self._agent_response is not None:
             await self._agent_response.append_fragment(event.text)
             self._agent_response.scroll_visible()
+            if self._speech is not None and self.speak_responses:
+                self._speech.feed(event.text)
         
     @on(ResponseMetadataUpdate)
     async def on_response_metadata_update(self, event: ResponseMetadataUpdate) -> None:
@@ -116,6 +173,8 @@ class Conversation(containers.Vertical):
 
     @on(AgentReady)
     async def on_agent_ready(self, event: AgentReady) -> None:
+        if self.agent is not None:
+            self.query_one("#user-prompt", Prompt).token_counter = self.agent.token_counter()
         message = f"{self.model_name} is ready for Inquiry."
         if self._agent_response is not None:
             await self._agent_response.append_fragment(message)
@@ -150,16 +209,165 @@ class Conversation(containers.Vertical):
             self.call_later(self.agent_turn_over, "end_turn")
             
             
+    async def action_toggle_voice(self) -> None:
+        """Push-to-talk: the first press starts listening, the second sends what was said."""
+        if self._voice_starting:
+            self.notify("Loading the speech model...", title="Voice")
+        elif self._voice_processor is None:
+            self._voice_text = []
+            self._voice_starting = True
+            self._start_voice()
+        else:
+            self._speech_ended_at = time.perf_counter()
+            self._voice_processor.stop(flush_partial=True)
+            self._voice_processor = None
+            self.query_one("#user-prompt", Prompt).border_subtitle = "Transcribing..."
+
+    @work(thread=True, exclusive=True, group="voice-load")
+    def _start_voice(self) -> None:
+        from le_chat.agent.stt_model import stt_models
+        if self._voice_model is None:
+            self._voice_model = stt_models.acquire(self.stt_model_name, self)
+        if self._voice_model.model is None:
+            # Load failed (already reported); try again on the next press.
+            stt_models.release(self._voice_model, self)
+            self._voice_model = None
+            self.app.call_from_thread(setattr, self, "_voice_starting", False)
+            return
+        self.app.call_from_thread(self._begin_recording)
+
+    def _begin_recording(self) -> None:
+        self._voice_starting = False
+        # Short chunks: each finalized segment is committed (and prefilled) while still talking.
+        self._voice_processor = processor = AudioProcessor(chunk_sec=2.0, max_chunk_sec=10.0)
+        self._voice_model.reset_stats()
+        processor.start()
+        self._transcribe_voice()
+        self._produce_voice_chunks(processor)
+        self.query_one("#user-prompt", Prompt).border_subtitle = "● Listening (F4 to send)"
+
+    @work(group="voice")
+    async def _transcribe_voice(self) -> None:
+        await self._voice_model.transcribe(self)
+
+    @work(group="voice")
+    async def _produce_voice_chunks(self, processor: AudioProcessor) -> None:
+        async for chunk in processor.achunks():
+            await self._voice_model.insert_samples(chunk.samples, captured_at=chunk.t1)
+        await self._voice_model.finish()
+
+    @on(STTResponseUpdate)
+    def on_voice_segment(self, event: STTResponseUpdate) -> None:
+        """A spoken segment is final: show it and prefill the agent with everything said so far."""
+        event.stop()
+        if not (text := event.text.strip()):
+            return
+        self._voice_text.append(text)
+        # Added to what was typed (or spoken) so far, not in place of it.
+        prompt_widget = self.query_one("#user-prompt", Prompt)
+        prompt_widget.text = f"{prompt_widget.text.rstrip()} {text}".lstrip()
+        prompt_widget.move_cursor(prompt_widget.document.end)
+        self.prefill_agent(prompt_widget.text)
+
+    @on(STTChunkTranscribed)
+    def on_voice_chunk_transcribed(self, event: STTChunkTranscribed) -> None:
+        event.stop()
+        if self._voice_processor is not None:
+            self._voice_processor.report_rtf(event.rtf)
+
+    def _release_voice_model(self) -> None:
+        """Hand the shared STT model back once a voice session is over."""
+        if self._voice_model is not None:
+            from le_chat.agent.stt_model import stt_models
+            stt_models.release(self._voice_model, self)
+            self._voice_model = None
+
+    @on(STTFullTranscriptionReady)
+    def on_voice_done(self, event: STTFullTranscriptionReady) -> None:
+        event.stop()
+        self._release_voice_model()
+        prompt_widget = self.query_one("#user-prompt", Prompt)
+        prompt_widget.border_subtitle = ""
+        if self._voice_text and (prompt := prompt_widget.text.strip()):
+            self.post_message(UserInputSubmitted(prompt))
+        else:
+            self._speech_ended_at = None
+            self.notify("No speech detected", title="Voice")
+
+    @on(STTModelFail)
+    def on_voice_fail(self, event: STTModelFail) -> None:
+        self.notify(f"{event.details}: {event.message}", title="Voice", severity="error")
+
+    @work(thread=True, exclusive=True, group="prefill")
+    def prefill_agent(self, text: str) -> None:
+        """Run the agent over the prompt spoken so far, so the reply starts sooner."""
+        if (prefill := getattr(self.agent, "prefill", None)) is not None:
+            started = time.perf_counter()
+            if tokens := prefill(text):
+                self.app.call_from_thread(self._show_prefilled, tokens, time.perf_counter() - started)
+
+    def _show_prefilled(self, tokens: int, seconds: float) -> None:
+        if self._voice_processor is not None:
+            self.query_one("#user-prompt", Prompt).border_subtitle = (
+                f"● Listening, prefilled {tokens} tokens in {seconds:.2f}s (F4 to send)"
+            )
+
+    def action_toggle_speech(self) -> None:
+        self.speak_responses = not self.speak_responses
+
+    def watch_speak_responses(self, speak: bool) -> None:
+        if speak:
+            if self._speech is None:
+                self._speech = SpeechPipeline(self.tts_model_name)
+            self._load_speech()
+            self.notify("Responses will be read aloud", title="Speech")
+        elif self._speech is not None:
+            self._speech.cancel()
+
+    @work(thread=True, exclusive=True, group="speech-load")
+    def _load_speech(self) -> None:
+        try:
+            self._speech.load()
+        except Exception as e:
+            self.app.call_from_thread(self.notify, f"{e}", title="Speech", severity="error")
+            self.app.call_from_thread(setattr, self, "speak_responses", False)
+
+    @on(SpeechFirstAudio)
+    def on_speech_first_audio(self, event: SpeechFirstAudio) -> None:
+        event.stop()
+        self.notify(f"Prompt → first audio: {event.latency_sec:.2f}s", title="Speech")
+
+    async def on_unmount(self) -> None:
+        if self._speech is not None:
+            self._speech.cancel()
+        if self._voice_processor is not None:
+            self._voice_processor.stop()
+            self._voice_processor = None
+        # Stop only this session; the model is shared (e.g. with the STT screen).
+        self.workers.cancel_group(self, "voice")
+        self._release_voice_model()
+
     async def agent_turn_over(self, stop_reason: str | None = "end_turn") -> None:
         # elaborate more on stop_reason
+        if self._agent_response is not None:
+            self._agent_response.finish_stream()
         self._agent_response = None
+        # The history grew by this turn.
+        self.query_one("#user-prompt", Prompt).refresh_token_count()
+        if self._speech is not None and self.speak_responses:
+            if stop_reason == "cancelled":
+                self._speech.cancel()
+            else:
+                self._speech.finish()
     
     async def action_cancel_generation(self) -> None:
         """Cancel the current generation if in progress."""
-        if self.agent is not None and self.busy_count > 0:
-            cancelled = await self.agent.cancel()
-            if cancelled:
-                self.call_later(self.agent_turn_over, "cancelled")
+        if self.agent is None or self.busy_count == 0 or self.query_one("#user-prompt", Prompt).completing:
+            # Let the key reach the prompt (closing the `@` popup, copying text).
+            raise SkipAction()
+        cancelled = await self.agent.cancel()
+        if cancelled:
+            self.call_later(self.agent_turn_over, "cancelled")
 
 
             
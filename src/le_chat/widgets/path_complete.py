@@ -0,0 +1,55 @@
+from textual.widgets import OptionList
+from textual.widgets.option_list import Option
+
+
+class PathCompletions(OptionList, can_focus=False):
+    """Popup listing the files that match the `@` reference being typed.
+
+    It never takes focus: the Prompt keeps the cursor and drives the
+    highlight with its own key bindings.
+    """
+
+    DEFAULT_CSS = """
+    PathCompletions {
+        overlay: screen;
+        dock: top;
+        constrain: inside inside;
+        width: auto;
+        min-width: 20;
+        max-width: 80;
+        height: auto;
+        max-height: 10;
+        padding: 0 1;
+        border: none;
+        background: $panel;
+        display: none;
+        &.-visible {
+            display: block;
+        }
+    }
+    """
+
+    @property
+    def is_open(self) -> bool:
+        return self.has_class("-visible")
+
+    def show(self, paths: list[str], x: int, y: int) -> None:
+        """List `paths` with the popup's bottom-left corner just above screen cell (x, y)."""
+        self.set_options(Option(path, id=path) for path in paths)
+        self.highlighted = 0
+        height = min(len(paths), 10)
+        self.styles.offset = (max(0, x), max(0, y - height))
+        self.add_class("-visible")
+
+    def hide(self) -> None:
+        self.remove_class("-visible")
+
+    def move(self, step: int) -> None:
+        if self.option_count:
+            self.highlighted = ((self.highlighted or 0) + step) % self.option_count
+
+    @property
+    def selected_path(self) -> str | None:
+        if not self.is_open or self.highlighted is None:
+            return None
+        return self.get_option_at_index(self.highlighted).id
@@ -1,20 +1,105 @@
+from bisect import bisect_right
 from dataclasses import dataclass
 import re
+from typing import Iterator
 
 from rich.text import Text
 
-from textual import containers, on
+from textual import containers, on, work
 from textual.app import ComposeResult
+from textual.actions import SkipAction
 from textual.binding import Binding
 from textual.content import Content
 from textual.highlight import highlight, HighlightTheme, TokenType
 from textual.message import Message
 from textual.reactive import reactive, var
+from textual.timer import Timer
 from textual.widgets import TextArea
+from textual.widgets.text_area import Edit, EditResult
+from textual.worker import get_current_worker
 
 from pygments.token import Token
 
+from le_chat.utils.prompt.file_index import file_index
+from le_chat.utils.prompt.token_count import PromptTokenCounter
+from le_chat.widgets.path_complete import PathCompletions
+
 RE_MATCH_FILE_PROMPT = re.compile(r"(@\S+)|@\"(.*)\"")
+# Fences as Pygments' Markdown lexer reads them: only backticks, and a closing
+# fence is exactly ``` (other fences are plain text to it).
+RE_FENCE_OPEN = re.compile(r"^\s*```(?:[\w\-]+(?:[^\S\n]+.*)?)?$")
+RE_FENCE_CLOSE = re.compile(r"^\s*```$")
+MAX_BLOCK_LINES = 64
+"""Longest block highlighted in one go, so an edit in a long paragraph or code block stays cheap."""
+TOKEN_COUNT_DELAY = 0.3
+"""Seconds of no typing before the prompt's tokens are counted again."""
+RE_PARTIAL_FILE_PROMPT = re.compile(r"(?:^|(?<=\s))@(\S*)$")
+"""An `@` reference being typed, ending at the cursor."""
+
+
+def iter_blocks(
+    lines: list[str], start: int = 0, fence: str | None = None, max_lines: int | None = None
+) -> Iterator[tuple[int, int, str | None]]:
+    """Split markdown lines into independently highlightable blocks.
+
+    A block ends at a blank line, and a fenced code block is always a block of
+    its own, so the lexer state at the start of every block is the same. With
+    `max_lines`, longer blocks are cut into pieces too; a piece inside a fence
+    records the fence's opening line, which is all the state needed to
+    highlight it on its own.
+
+    Args:
+        lines: The document's lines.
+        start: Line to start at; must be the start of a block.
+        fence: Opening line of the fence `start` is inside, or None.
+        max_lines: Most lines in a block, or None for no limit.
+
+    Yields:
+        (start, end, fence) line ranges, end exclusive, with the fence each
+        starts inside.
+    """
+    block_start, block_fence = start, fence
+    for index in range(start, len(lines)):
+        line = lines[index]
+        if max_lines is not None and index - block_start >= max_lines:
+            yield block_start, index, block_fence
+            block_start, block_fence = index, fence
+        if fence is not None:
+            if RE_FENCE_CLOSE.match(line):
+                yield block_start, index + 1, block_fence
+                block_start, block_fence = index + 1, None
+                fence = None
+        elif RE_FENCE_OPEN.match(line):
+            if index > block_start:
+                yield block_start, index, block_fence
+            block_start, block_fence = index, None
+            fence = line
+        elif not line.strip():
+            yield block_start, index + 1, block_fence
+            block_start, block_fence = index + 1, None
+    if block_start < len(lines):
+        yield block_start, len(lines), block_fence
+
+
+def split_blocks(lines: list[str]) -> list[tuple[int, int]]:
+    """Split markdown lines into independently highlightable blocks (see `iter_blocks`).
+
+    Returns:
+        (start, end) line ranges, end exclusive.
+    """
+    return [(start, end) for start, end, _ in iter_blocks(lines)]
+
+
+class _HighlightedBlock:
+    """Highlighted lines of one block, with their rendered `Text` once drawn."""
+
+    __slots__ = ("lines", "rendered", "fence")
+
+    def __init__(self, lines: list[Content], fence: str | None = None) -> None:
+        self.lines = lines
+        self.rendered: list[tuple[object, Text] | None] = [None] * len(lines)
+        self.fence = fence
+        """Opening line of the fence the block continues, if it starts inside one."""
 
 class TextualHighlightTheme(HighlightTheme):
     """Contains the style definition for user with the highlight method."""
@@ -79,9 +164,14 @@ class Prompt(TextArea):
             key_display="⇧+⏎",
             tooltip="Insert a new line character",
         ),
+        Binding("up", "completion_move(-1)", show=False, priority=True),
+        Binding("down", "completion_move(1)", show=False, priority=True),
+        Binding("tab", "completion_accept", show=False, priority=True),
+        Binding("escape", "completion_dismiss", show=False, priority=True),
     ]
     
     warning_message = var("")
+    token_counter: var[PromptTokenCounter | None] = var(None)
 
     def __init__(
         self,
@@ -93,8 +183,15 @@ class Prompt(TextArea):
         disabled: bool = False,
         placeholder: str | Content = ""
     ):
-        self._text_cache: dict[int, Text] = {}
-        self._highlight_lines: list[Content] | None = None
+        # Highlighted blocks in document order, with the line each starts at.
+        self._blocks: list[_HighlightedBlock] = []
+        self._block_starts: list[int] = []
+        self._line_blocks: list[tuple[_HighlightedBlock, int]] = []
+        self._lines: list[str] | None = None
+        """The document lines as last highlighted; None until the first highlight."""
+        self._completions = PathCompletions()
+        self._token_count_timer: Timer | None = None
+        self._token_count_label = ""
         super().__init__(
             text,
             name=name,
@@ -108,20 +205,204 @@ class Prompt(TextArea):
 
     def on_mount(self) -> None:
         self.update_prompt()
+        self.screen.mount(self._completions)
+        file_index.refresh()
+
+    def on_focus(self) -> None:
+        # Picks up files created since the last refresh (rate limited by the index).
+        file_index.refresh()
+
+    def on_blur(self) -> None:
+        self._completions.hide()
+
+    @property
+    def completing(self) -> bool:
+        """True while the `@` path popup is open."""
+        return self._completions.is_open
+
+    def _partial_reference(self) -> tuple[int, int, str] | None:
+        """(row, column of the `@`, text typed after it) when the cursor ends an `@` reference."""
+        if self.selection.start != self.selection.end:
+            return None
+        row, column = self.cursor_location
+        match = RE_PARTIAL_FILE_PROMPT.search(self.document.get_line(row)[:column])
+        if match is None:
+            return None
+        return row, match.start(), match.group(1)
+
+    def _update_completions(self) -> None:
+        reference = self._partial_reference() if self.has_focus else None
+        paths = file_index.search(reference[2]) if reference is not None else []
+        if not paths or paths == [reference[2]]:
+            self._completions.hide()
+            return
+        row, column, query = reference
+        cursor_x, cursor_y = self.cursor_screen_offset
+        self._completions.show(paths, cursor_x - len(query) - 1, cursor_y)
+
+    @on(TextArea.SelectionChanged)
+    def _on_selection_changed(self) -> None:
+        self._update_completions()
+
+    def action_completion_move(self, step: int) -> None:
+        if not self.completing:
+            raise SkipAction()
+        self._completions.move(step)
+
+    def action_completion_accept(self) -> None:
+        if (path := self._completions.selected_path) is None or (reference := self._partial_reference()) is None:
+            raise SkipAction()
+        row, column, query = reference
+        if any(char.isspace() for char in path):
+            path = f'"{path}"'
+        self.replace(f"@{path} ", (row, column), (row, column + len(query) + 1))
+        self._completions.hide()
+
+    def action_completion_dismiss(self) -> None:
+        if not self.completing:
+            raise SkipAction()
+        self._completions.hide()
 
     def watch_warning_message(self, value: str):
         self.border_title = value
+
+    def watch_token_counter(self) -> None:
+        self.refresh_token_count()
+
+    def refresh_token_count(self) -> None:
+        """Count the prompt's tokens once typing pauses (and after the history changed)."""
+        if self._token_count_timer is not None:
+            self._token_count_timer.stop()
+        if self.token_counter is None:
+            self._show_token_count("")
+            return
+        self._token_count_timer = self.set_timer(TOKEN_COUNT_DELAY, lambda: self._count_tokens(self.text))
+
+    @work(thread=True, exclusive=True, group="token-count")
+    def _count_tokens(self, text: str) -> None:
+        counter = self.token_counter
+        if counter is None:
+            return
+        try:
+            label = counter.count(text).label()
+        except Exception:
+            import traceback
+            print(traceback.format_exc())
+            return
+        if not get_current_worker().is_cancelled:
+            self.app.call_from_thread(self._show_token_count, label)
+
+    def _show_token_count(self, label: str) -> None:
+        # Attachment progress and voice status take the subtitle while they run.
+        if not self.border_subtitle or self.border_subtitle == self._token_count_label:
+            self.border_subtitle = label
+        self._token_count_label = label
+
+    def show_attachment_progress(self, done: int, total: int, path: str) -> None:
+        """Progress callback for `validate_input_files_async`."""
+        self.border_subtitle = "" if done >= total else f"Loading attachments {done}/{total} · {path}"
         
+    @property
+    def line_blocks(self) -> list[tuple[_HighlightedBlock, int]]:
+        """For every document line, its highlighted block and the line's offset in it."""
+        if self._lines is None:
+            self._rehighlight(0, -1, self.document.line_count - 1)
+        return self._line_blocks
+
+    def edit(self, edit: Edit) -> EditResult:
+        top, bottom = edit.top[0], edit.bottom[0]
+        result = super().edit(edit)
+        if self._lines is not None:
+            self._rehighlight(top, bottom, result.end_location[0])
+        return result
+
+    def undo(self) -> None:
+        super().undo()
+        self._resync_highlights()
+
+    def redo(self) -> None:
+        super().redo()
+        self._resync_highlights()
+
+    def load_text(self, text: str) -> None:
+        super().load_text(text)
+        self._resync_highlights()
+
+    def _resync_highlights(self) -> None:
+        """Re-highlight the lines that changed without going through `edit`."""
+        if (old := self._lines) is None:
+            return
+        new = self.document.lines
+        shortest = min(len(old), len(new))
+        top = 0
+        while top < shortest - 1 and old[top] == new[top]:
+            top += 1
+        unchanged = 0
+        while unchanged < shortest - top - 1 and old[-1 - unchanged] == new[-1 - unchanged]:
+            unchanged += 1
+        self._rehighlight(top, len(old) - 1 - unchanged, len(new) - 1 - unchanged)
+
+    def _rehighlight(self, top: int, old_bottom: int, new_bottom: int) -> None:
+        """Update the highlighted blocks after rows `top`..`old_bottom` became `top`..`new_bottom`.
+
+        Highlighting starts again at the block the edit starts in and stops at
+        the first later block that starts, past the edit, on the same line and
+        inside the same fence as before: everything from there on splits and
+        highlights as it did. Lines whose highlight is unchanged keep their
+        rendered `Text`.
+        """
+        lines = self.document.lines
+        shift = new_bottom - old_bottom
+        first = max(bisect_right(self._block_starts, top) - 1, 0)
+        if first > 0 and self._block_starts[first] == top:
+            # The edited line may have been a fence that cut the block before it short.
+            first -= 1
+        if first < len(self._blocks):
+            start, fence = self._block_starts[first], self._blocks[first].fence
+        else:
+            start, fence = 0, None
+        old_count = len(self._line_blocks)
+        resume = len(self._blocks)
+        blocks, starts = [], []
+        for block_start, block_end, block_fence in iter_blocks(lines, start, fence, MAX_BLOCK_LINES):
+            if block_start > new_bottom:
+                index = bisect_right(self._block_starts, block_start - shift, first) - 1
+                if (
+                    index >= first
+                    and self._block_starts[index] == block_start - shift
+                    and self._blocks[index].fence == block_fence
+                ):
+                    resume = index
+                    break
+            blocks.append(self._highlight_block(lines[block_start:block_end], block_fence))
+            starts.append(block_start)
+
+        rendered = {
+            content: drawn
+            for block in self._blocks[first:resume]
+            for content, drawn in zip(block.lines, block.rendered)
+            if drawn is not None
+        }
+        for block in blocks:
+            block.rendered = [rendered.get(content) for content in block.lines]
+
+        end = self._block_starts[resume] if resume < len(self._blocks) else old_count
+        self._line_blocks[start:end] = [(block, offset) for block in blocks for offset in range(len(block.lines))]
+        self._block_starts[first:] = starts + [block_start + shift for block_start in self._block_starts[resume:]]
+        self._blocks[first:] = blocks + self._blocks[resume:]
+        self._lines = list(lines)
+
+    def _highlight_block(self, lines: list[str], fence: str | None) -> _HighlightedBlock:
+        if fence is None:
+            content = self.highlight_markdown("\n".join(lines))
+            return _HighlightedBlock(content.split("\n", allow_blank=True)[:-1])
+        # The rest of a long fenced block: highlighted after its opening line, which is dropped again.
+        content = self.highlight_markdown("\n".join([fence, *lines]))
+        return _HighlightedBlock(content.split("\n", allow_blank=True)[1:-1], fence)
+
     @property
     def highlight_lines(self) -> list[Content]:
-        if self._highlight_lines is None:
-            text = self.text
-            language = self.highlight_language
-            if language == "markdown":
-                content = self.highlight_markdown(text)
-                content_lines = content.split("\n" ,allow_blank=True)[:-1]
-                self._highlight_lines = content_lines
-        return self._highlight_lines
+        return [block.lines[offset] for block, offset in self.line_blocks]
 
     def highlight_markdown(self, text: str) -> Content:
         content = highlight(
@@ -136,9 +417,12 @@ class Prompt(TextArea):
         self.insert("\n")
 
     def action_prompt_submit(self) -> None:
+        if self.completing:
+            self.action_completion_accept()
+            return
         if self.text:
             self.post_message(UserInputSubmitted(self.text))
-            self.border_title = ""
+            self.warning_message = ""
             self.update_prompt()
     
     def update_prompt(self) -> None:
@@ -151,21 +435,22 @@ class Prompt(TextArea):
 
     @on(TextArea.Changed)
     def _on_changed(self) -> None:
-        self._highlight_lines = None
-        self._text_cache.clear()
+        self._update_completions()
+        self.refresh_token_count()
     
     def get_line(self, line_index: int) -> Text:
-        if (cached_line := self._text_cache.get(line_index)) is not None:
-            return cached_line.copy()
         try:
-            line = self.highlight_lines[line_index]
+            block, offset = self.line_blocks[line_index]
         except IndexError:
             return Text("", end="", no_wrap=True)
-        rendered_line = list(line.render_segments(self.visual_style))
+        visual_style = self.visual_style
+        if (cached := block.rendered[offset]) is not None and cached[0] == visual_style:
+            return cached[1].copy()
+        rendered_line = list(block.lines[offset].render_segments(visual_style))
         text = Text.assemble(
             *[(text, style) for text, style, _ in rendered_line],
             end="",
             no_wrap=True,
         )
-        self._text_cache[line_index] = text.copy()
+        block.rendered[offset] = (visual_style, text.copy())
         return text
\ No newline at end of file
@@ -1,10 +1,23 @@
 from dataclasses import dataclass
-from typing import Optional
+from typing import Callable, Literal, Optional
+from textual import work
+from textual.content import Content
+from textual.highlight import highlight
 from textual.reactive import reactive, var
 from textual.message import Message
-from textual.widgets import Markdown
+from textual.widgets import Markdown, Static
 from textual.widgets.markdown import MarkdownStream
 
+from le_chat.widgets.prompt import TextualHighlightTheme, split_blocks
+
+StreamMode = Literal["plain", "markdown"]
+"""How a response renders while streaming.
+
+"plain" shows the text as highlighted Markdown source and renders it as
+Markdown once, when the response is complete; "markdown" re-renders the
+last Markdown block on every fragment.
+"""
+
 
 @dataclass
 class ResponseUpdate(Message):
@@ -18,16 +31,47 @@ class ResponseMetadataUpdate(Message):
     prompt_tps: Optional[float] = None
     generation_tps: Optional[float] = None
     peak_memory: Optional[float] = None
-    
+    attachment_tokens_saved: Optional[int] = None
+
+
+def highlight_block(text: str) -> Content:
+    """Markdown syntax highlighting of one block, also while it ends inside an open code fence."""
+    content = highlight(text + "\n```", language="markdown", theme=TextualHighlightTheme)
+    return Content("\n").join(content.split("\n", allow_blank=True)[:-1])
+
+
+class StreamedBlock(Static):
+    """One block of a response that is still streaming, shown as highlighted source."""
+
+    DEFAULT_CSS = """
+    StreamedBlock {
+        height: auto;
+    }
+    """
+
 
 class Response(Markdown):
     BORDER_TITLE = "Le Chat"
+    DEFAULT_CSS = """
+    Response.-rendering > MarkdownBlock {
+        display: none;
+    }
+    """
     show_response_metadata = var(True)
 
-    def __init__(self, markdown: str | None = None) -> None:
+    def __init__(self, markdown: str | None = None, stream_mode: StreamMode = "plain") -> None:
         super().__init__(markdown)
+        self.stream_mode = stream_mode
         self._stream: MarkdownStream | None = None
         self._metadata: ResponseMetadataUpdate | None = None
+        # Plain streaming: everything received since the last Markdown render,
+        # and the part of it after the last finished block.
+        self._streamed: list[str] = []
+        self._tail = ""
+        self._open_block: StreamedBlock | None = None
+        self._render_pending = False
+        # Bumped by `finish_stream`, so blocks still mounting from before are dropped.
+        self._generation = 0
 
     @property
     def stream(self) -> MarkdownStream:
@@ -35,9 +79,89 @@ class Response(Markdown):
             self._stream = self.get_stream(self)
         return self._stream
     
+    def snapshot(self) -> Callable[[], "Response"]:
+        markdown, title, subtitle = self.full_source, self.border_title, self.border_subtitle
+
+        def restore() -> Response:
+            response = Response(markdown)
+            response.border_title = title
+            response.border_subtitle = subtitle
+            return response
+
+        return restore
+
+    @property
+    def full_source(self) -> str:
+        """The whole response, including text not rendered as Markdown yet."""
+        return self.source + "".join(self._streamed)
+
     async def append_fragment(self, fragment: str) -> None:
-        await self.stream.write(fragment)
-    
+        if self.stream_mode == "markdown":
+            await self.stream.write(fragment)
+            return
+        self._streamed.append(fragment)
+        self._tail += fragment
+        if not self._render_pending:
+            self._render_pending = True
+            self.call_after_refresh(self._render_tail)
+
+    async def _render_tail(self) -> None:
+        """Freeze finished blocks and redraw the open one; at most once per refresh.
+
+        Finished blocks are highlighted once and never touched again, so the
+        cost of an update depends on the size of the last block only, not on
+        the length of the response.
+        """
+        self._render_pending = False
+        if not self._streamed:
+            return
+        lines = self._tail.split("\n")
+        blocks = split_blocks(lines)
+        finished = [StreamedBlock(highlight_block("\n".join(lines[start:end]))) for start, end in blocks[:-1]]
+        if blocks:
+            # Updated before awaiting: fragments keep arriving while blocks mount.
+            self._tail = "\n".join(lines[blocks[-1][0]:])
+        generation = self._generation
+        open_block = self._open_block
+        if open_block is None:
+            open_block = self._open_block = StreamedBlock()
+            finished.append(open_block)
+            await self.mount_all(finished)
+        elif finished:
+            await self.mount_all(finished, before=open_block)
+        if generation != self._generation:
+            # The stream finished while the blocks were mounting; the Markdown replaces them.
+            await self.remove_children([block for block in finished if block.parent is self])
+            return
+        open_block.update(highlight_block(self._tail))
+
+    @work(group="finish-stream")
+    async def finish_stream(self) -> None:
+        """Render the streamed response as Markdown, in one parse and layout.
+
+        Runs as a worker: the render takes a while for long responses and
+        should not hold up whoever ends the turn.
+        """
+        if self.stream_mode == "markdown":
+            if self._stream is not None:
+                await self._stream.stop()
+                self._stream = None
+            return
+        if not self._streamed:
+            return
+        markdown = self.full_source
+        self._generation += 1
+        self._streamed = []
+        self._tail = ""
+        self._open_block = None
+        # The preview stays up while the Markdown is parsed and mounted hidden,
+        # then the two are swapped in one screen update.
+        self.add_class("-rendering")
+        await self.update(markdown)
+        with self.app.batch_update():
+            await self.remove_children(StreamedBlock)
+            self.remove_class("-rendering")
+
     async def update_border_subtitle(self, details: ResponseMetadataUpdate) -> None:
         self._metadata = details
         if self.show_response_metadata:
@@ -50,7 +174,8 @@ class Response(Markdown):
                 tps_strs.append(f"gen TPS: {details.generation_tps:.2f}")
             tps_info = ", ".join(tps_strs) if tps_strs else ""
             mem_info = f"Peak Mem: {details.peak_memory:.2f} GB" if details.peak_memory is not None else ""
-            info = " | ".join(filter(None, [tps_info, mem_info]))
+            saved_info = f"Attachments trimmed: -{details.attachment_tokens_saved} tokens" if details.attachment_tokens_saved else ""
+            info = " | ".join(filter(None, [tps_info, mem_info, saved_info]))
             self.border_subtitle = info or " "
         else:
             self.border_subtitle = ""
@@ -0,0 +1,139 @@
+"""Streaming render benchmark for `Response`.
+
+Streams a long synthetic answer (prose, tables and code fences) into a
+headless app at a fixed token rate, once per stream mode, and prints the
+results as JSON:
+
+    python -m le_chat.widgets.stream_benchmark
+    python -m le_chat.widgets.stream_benchmark --tokens-per-sec 100 500 2000 --tokens 8000
+
+`lag_sec` is how far the render fell behind the generator by the last
+token, `max_stall_ms` the longest the event loop was blocked while
+streaming (what the user feels as a frozen UI), and `finish_sec` the time
+of the final Markdown render on turn over, layout included.
+"""
+import argparse
+import asyncio
+from dataclasses import asdict, dataclass
+import json
+import re
+import time
+
+from textual.app import App, ComposeResult
+from textual.containers import VerticalScroll
+
+from le_chat.widgets.response import Response, StreamMode
+
+SECTION = """\
+## Step {n}
+
+Here is some explanation for step {n}, long enough to wrap across the width of a terminal \
+and to contain **bold**, *italic* and `inline code`.
+
+| name | value | notes |
+|------|-------|-------|
+| alpha | {n} | first |
+| beta | {n2} | second |
+| gamma | {n3} | third |
+
+```python
+def step_{n}(values):
+    total = 0
+    for value in values:
+        total += value * {n}
+    return total
+```
+
+"""
+
+
+def synthetic_answer(tokens: int) -> list[str]:
+    """A Markdown answer split into about `tokens` word-sized fragments."""
+    fragments: list[str] = []
+    n = 0
+    while len(fragments) < tokens:
+        n += 1
+        fragments += re.findall(r"\S+\s*|\s+", SECTION.format(n=n, n2=n * 2, n3=n * 3))
+    return fragments[:tokens]
+
+
+@dataclass
+class RunResult:
+    mode: str
+    tokens_per_sec: float
+    tokens: int
+    stream_sec: float
+    lag_sec: float
+    max_stall_ms: float
+    mean_append_ms: float
+    finish_sec: float
+
+
+class BenchmarkApp(App):
+    def compose(self) -> ComposeResult:
+        yield VerticalScroll(id="chat-view")
+
+
+async def _watch_stalls(stalls: list[float], interval: float = 0.005) -> None:
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - started - interval)
+
+
+async def run(mode: StreamMode, tokens_per_sec: float, fragments: list[str], size: tuple[int, int]) -> RunResult:
+    app = BenchmarkApp()
+    async with app.run_test(size=size) as pilot:
+        response = Response(stream_mode=mode)
+        await app.query_one("#chat-view").mount(response)
+        await pilot.pause()
+        stalls: list[float] = []
+        watcher = asyncio.create_task(_watch_stalls(stalls))
+        append_sec = 0.0
+        started = time.perf_counter()
+        for index, fragment in enumerate(fragments):
+            # Tokens are due at a fixed rate; if rendering falls behind, they queue up.
+            if (delay := started + index / tokens_per_sec - time.perf_counter()) > 0:
+                await asyncio.sleep(delay)
+            append_started = time.perf_counter()
+            await response.append_fragment(fragment)
+            append_sec += time.perf_counter() - append_started
+        await pilot.pause()
+        stream_sec = time.perf_counter() - started
+        watcher.cancel()
+        finish_started = time.perf_counter()
+        await response.finish_stream().wait()
+        await pilot.pause()
+        finish_sec = time.perf_counter() - finish_started
+    return RunResult(
+        mode=mode,
+        tokens_per_sec=tokens_per_sec,
+        tokens=len(fragments),
+        stream_sec=stream_sec,
+        lag_sec=max(0.0, stream_sec - len(fragments) / tokens_per_sec),
+        max_stall_ms=max(stalls, default=0.0) * 1000,
+        mean_append_ms=append_sec / len(fragments) * 1000,
+        finish_sec=finish_sec,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare the stream modes of a response.")
+    parser.add_argument("--tokens", type=int, default=4000)
+    parser.add_argument("--tokens-per-sec", type=float, nargs="+", default=[100.0, 500.0])
+    parser.add_argument("--modes", nargs="+", default=["plain", "markdown"], choices=["plain", "markdown"])
+    parser.add_argument("--width", type=int, default=120)
+    parser.add_argument("--height", type=int, default=40)
+    args = parser.parse_args()
+
+    fragments = synthetic_answer(args.tokens)
+    runs = [
+        asyncio.run(run(mode, rate, fragments, (args.width, args.height)))
+        for rate in args.tokens_per_sec
+        for mode in args.modes
+    ]
+    print(json.dumps({"runs": [asdict(result) for result in runs]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,9 @@ def copy_to_clipboard(text: str) -> bool:
 @dataclass
 class STTResponseUpdate(Message):
     text: str
+    start: float | None = None
+    """Offset of this text in the source audio, in seconds, when known."""
+    end: float | None = None
 
 
 class CopyButton(Button):
@@ -1,4 +1,4 @@
-from typing import Iterable
+from typing import Callable, Iterable
 
 from rich.text import Text
 
@@ -49,6 +49,10 @@ class UserInput(containers.HorizontalGroup):
         yield NonSelectableLabel("❯", id="prompt")
         yield HighlightedContent(self.content, id="content")
 
+    def snapshot(self) -> Callable[[], "UserInput"]:
+        content = self.content
+        return lambda: UserInput(content)
+
     def get_block_menu(self) -> Iterable[MenuItem]:
         yield from ()
 